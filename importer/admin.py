@@ -16,6 +16,11 @@ from importer.models import (
     ExtractionLog,
     ZSODemand,
     ProcessProgress,
+    MailboxAccount,
+    IngestedMessage,
+    FileLease,
+    IngestionJournal,
+    ParseCacheEntry,
 )
 
 from importer.services.process_file import process_file
@@ -97,6 +102,56 @@ class RawFileAdmin(admin.ModelAdmin):
         transaction.on_commit(lambda: process_file(obj))
 
 
+# ─────────────────────────────────────────────
+# MailboxAccount Admin
+# ─────────────────────────────────────────────
+@admin.register(MailboxAccount)
+class MailboxAccountAdmin(admin.ModelAdmin):
+    list_display = ("name", "username", "host", "mailboxes", "is_active")
+    list_filter = ("is_active",)
+
+
+# ─────────────────────────────────────────────
+# IngestedMessage Admin
+# ─────────────────────────────────────────────
+@admin.register(IngestedMessage)
+class IngestedMessageAdmin(admin.ModelAdmin):
+    list_display = ("message_id", "account", "mailbox", "uid", "sender", "ingested_at")
+    list_filter = ("account", "mailbox")
+    search_fields = ("message_id", "sender")
+
+
+# ─────────────────────────────────────────────
+# FileLease Admin
+# ─────────────────────────────────────────────
+@admin.register(FileLease)
+class FileLeaseAdmin(admin.ModelAdmin):
+    list_display = ("path", "owner", "claimed_at", "expires_at")
+    search_fields = ("path", "owner")
+
+
+# ─────────────────────────────────────────────
+# IngestionJournal Admin
+# ─────────────────────────────────────────────
+@admin.register(IngestionJournal)
+class IngestionJournalAdmin(admin.ModelAdmin):
+    list_display = ("path", "state", "attempts", "raw_file", "updated_at")
+    list_filter = ("state",)
+    search_fields = ("path", "sha256")
+    exclude = ("payload",)
+
+
+# ─────────────────────────────────────────────
+# ParseCacheEntry Admin
+# ─────────────────────────────────────────────
+@admin.register(ParseCacheEntry)
+class ParseCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "importer", "version", "size_bytes", "hits", "last_used_at")
+    list_filter = ("importer", "version")
+    search_fields = ("sha256",)
+    exclude = ("payload",)
+
+
 # ─────────────────────────────────────────────
 # ExtractedRecord Admin (PROGRESS BAR ENABLED)
 # ─────────────────────────────────────────────
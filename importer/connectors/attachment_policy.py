@@ -0,0 +1,150 @@
+"""
+Attachment policy for the email reader.
+
+Decides from part metadata (name, MIME type, size, sender) whether an
+attachment is worth downloading at all, then checks the first bytes
+against the expected file signature before anything is written.
+Logos, calendar invites, vCards and signature images are dropped here
+instead of failing later in UnifiedImporter.
+"""
+
+import os
+from email.utils import parseaddr
+from pathlib import Path
+
+from importer.extraction.router import SUPPORTED_EXTENSIONS
+
+
+def _csv_env(name, default=""):
+    return [v.strip().lower() for v in os.getenv(name, default).split(",") if v.strip()]
+
+
+# MIME types routed to an importer when the filename has no extension
+PARSEABLE_MIME_TYPES = {
+    "application/pdf": ".pdf",
+    "application/vnd.ms-excel": ".xls",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "text/csv": ".csv",
+    "text/plain": ".txt",
+}
+
+# Extensions accepted (default: everything an importer can parse)
+ALLOWED_EXTENSIONS = _csv_env("ATTACHMENT_ALLOWED_EXTENSIONS", ",".join(SUPPORTED_EXTENSIONS))
+
+# Extra MIME types accepted for attachments without a usable extension
+ALLOWED_MIME_TYPES = _csv_env("ATTACHMENT_ALLOWED_MIME_TYPES", ",".join(PARSEABLE_MIME_TYPES))
+
+# Decoded size bounds; tiny parts are almost always inline images
+MIN_BYTES = int(os.getenv("ATTACHMENT_MIN_BYTES", 64))
+MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", 50 * 1024 * 1024))
+
+# "po@customer.com" or "@customer.com"; an empty allowlist allows everyone
+SENDER_ALLOWLIST = _csv_env("ATTACHMENT_SENDER_ALLOWLIST")
+SENDER_BLOCKLIST = _csv_env("ATTACHMENT_SENDER_BLOCKLIST")
+
+# Leading bytes each extension must start with (None → any)
+_OLE2 = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_ZIP = b"PK\x03\x04"
+MAGIC_BYTES = {
+    ".xlsx": (_ZIP,),
+    ".docx": (_ZIP,),
+    # ERP exports often label xlsx as .xls. HTML tables saved as .xls are
+    # rejected: no importer reads them
+    ".xls": (_OLE2, _ZIP),
+    ".pdf": (b"%PDF",),
+}
+SNIFF_BYTES = 1024
+
+
+class AttachmentRejected(Exception):
+    pass
+
+
+def _sender_matches(address, rules) -> bool:
+    domain = address.rpartition("@")[2]
+    return any(
+        address == rule or domain == rule.lstrip("@")
+        for rule in rules
+    )
+
+
+def check_sender(sender):
+    """
+    Returns a rejection reason, or None if the sender's attachments are wanted.
+    """
+    address = parseaddr(sender or "")[1].lower()
+
+    if SENDER_BLOCKLIST and _sender_matches(address, SENDER_BLOCKLIST):
+        return f"sender {address} is blocked"
+    if SENDER_ALLOWLIST and not _sender_matches(address, SENDER_ALLOWLIST):
+        return f"sender {address or 'unknown'} is not allowlisted"
+    return None
+
+
+def attachment_extension(filename, content_type) -> str:
+    ext = Path(filename or "").suffix.lower()
+    return ext or PARSEABLE_MIME_TYPES.get((content_type or "").lower(), "")
+
+
+def check_part(filename, content_type, size=None):
+    """
+    Metadata-only check, run before a single byte is downloaded.
+    Returns a rejection reason or None.
+    """
+    ext = Path(filename or "").suffix.lower()
+    content_type = (content_type or "").lower()
+
+    if ext:
+        if ext not in ALLOWED_EXTENSIONS:
+            return f"extension {ext} not allowed"
+    elif content_type not in ALLOWED_MIME_TYPES:
+        return f"type {content_type or 'unknown'} not allowed"
+
+    if size is not None:
+        if size < MIN_BYTES:
+            return f"{size} bytes is below ATTACHMENT_MIN_BYTES"
+        if size > MAX_BYTES:
+            return f"{size} bytes is above ATTACHMENT_MAX_BYTES"
+    return None
+
+
+def check_magic(filename, content_type, head: bytes):
+    """
+    Signature check on the first decoded bytes of an attachment.
+    """
+    ext = attachment_extension(filename, content_type)
+    head = head[:SNIFF_BYTES]
+
+    if ext in (".csv", ".txt"):
+        if b"\x00" in head:
+            return f"{ext} attachment is binary"
+        return None
+
+    signatures = MAGIC_BYTES.get(ext)
+    if not signatures:
+        return None
+
+    if ext == ".pdf":
+        # PDF allows junk before the header
+        return None if b"%PDF" in head else "not a PDF"
+    if not head.lstrip().startswith(signatures):
+        return f"content does not match {ext}"
+    return None
+
+
+def checked_stream(chunks, filename, content_type):
+    """
+    Pass chunks through, raising AttachmentRejected before the first
+    chunk reaches the writer if its signature is wrong.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+
+    reason = check_magic(filename, content_type, first)
+    if reason:
+        raise AttachmentRejected(reason)
+
+    if first:
+        yield first
+    yield from chunks
@@ -0,0 +1,296 @@
+"""
+IMAP BODYSTRUCTURE helpers.
+
+Lets the reader look at a message's MIME tree without downloading it,
+then fetch only the sections it needs (body text, parseable
+attachments) in fixed-size partial fetches that are decoded and
+written to disk chunk by chunk.
+"""
+
+import os
+import binascii
+from email.header import decode_header, make_header
+from urllib.parse import unquote
+
+from config.logger import logger
+
+
+# Bytes per partial BODY.PEEK[<section>]<offset.size> fetch
+PART_CHUNK_BYTES = int(os.getenv("EMAIL_PART_CHUNK_BYTES", 1024 * 1024))
+
+_ATOM_END = b" ()\r\n"
+
+
+# ------------------------------------------------------------------
+# RESPONSE PARSING
+# ------------------------------------------------------------------
+
+def _flatten(msg_data):
+    """
+    Join imaplib's (header, literal) tuples back into one byte stream,
+    keeping literals aside so they are never scanned as syntax.
+    """
+    buf = b""
+    literals = []
+    for item in msg_data:
+        if isinstance(item, tuple):
+            buf += item[0]
+            literals.append(item[1])
+        elif isinstance(item, bytes):
+            buf += item
+    return buf, literals
+
+
+def _tokenize(buf, literals):
+    """
+    Parse an IMAP response into nested lists.
+
+    Atoms → str (NIL → None), quoted strings → str, literals → bytes.
+    `BODY[...]<...>` keys are kept as a single atom.
+    """
+    literals = list(literals)
+    stack = [[]]
+    i = 0
+    n = len(buf)
+
+    while i < n:
+        c = buf[i:i + 1]
+
+        if c in (b" ", b"\r", b"\n"):
+            i += 1
+
+        elif c == b"(":
+            stack.append([])
+            i += 1
+
+        elif c == b")":
+            done = stack.pop()
+            stack[-1].append(done)
+            i += 1
+
+        elif c == b'"':
+            i += 1
+            out = bytearray()
+            while i < n and buf[i:i + 1] != b'"':
+                if buf[i:i + 1] == b"\\":
+                    i += 1
+                out += buf[i:i + 1]
+                i += 1
+            i += 1
+            stack[-1].append(out.decode("utf-8", errors="replace"))
+
+        elif c == b"{":
+            end = buf.index(b"}", i)
+            i = end + 1
+            stack[-1].append(literals.pop(0) if literals else b"")
+
+        else:
+            start = i
+            while i < n and buf[i:i + 1] not in _ATOM_END:
+                if buf[i:i + 1] == b"[":
+                    i = buf.index(b"]", i)
+                i += 1
+            atom = buf[start:i].decode("ascii", errors="replace")
+            stack[-1].append(None if atom.upper() == "NIL" else atom)
+
+    return stack[0]
+
+
+def parse_fetch_response(msg_data) -> list:
+    """
+    Turn a UID FETCH response into one dict per message,
+    keyed by upper-cased item name (UID, BODYSTRUCTURE, BODY[...]).
+    """
+    tokens = _tokenize(*_flatten(msg_data))
+
+    # imaplib strips "* <seq> FETCH", leaving "<seq> (<items>)"
+    messages = []
+    for idx, token in enumerate(tokens):
+        if not isinstance(token, list) or idx == 0:
+            continue
+        if not str(tokens[idx - 1]).isdigit():
+            continue
+
+        items = {}
+        for j in range(0, len(token) - 1, 2):
+            key = str(token[j]).upper()
+            items[key] = token[j + 1]
+        messages.append(items)
+
+    return messages
+
+
+# ------------------------------------------------------------------
+# MIME TREE
+# ------------------------------------------------------------------
+
+def _params(value) -> dict:
+    if not isinstance(value, list):
+        return {}
+    out = {}
+    for k in range(0, len(value) - 1, 2):
+        if isinstance(value[k], str):
+            out[value[k].lower()] = value[k + 1]
+    return out
+
+
+def _decode_filename(params: dict):
+    name = params.get("filename") or params.get("name")
+    if name is None:
+        star = params.get("filename*") or params.get("name*")
+        if star:
+            # RFC 2231: charset'lang'percent-encoded
+            charset, _, rest = star.partition("'")
+            _, _, encoded = rest.partition("'")
+            name = unquote(encoded, encoding=charset or "utf-8", errors="replace")
+    if isinstance(name, bytes):
+        name = name.decode("utf-8", errors="replace")
+    if name:
+        try:
+            name = str(make_header(decode_header(name)))
+        except Exception:
+            pass
+    return name
+
+
+def walk_parts(structure, prefix=""):
+    """
+    Yield a flat dict for every leaf part of a BODYSTRUCTURE tree:
+    section, content_type, encoding, size, disposition, filename, charset.
+    """
+    if not isinstance(structure, list) or not structure:
+        return
+
+    # Multipart: leading child lists, then the subtype
+    if isinstance(structure[0], list):
+        child_no = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            child_no += 1
+            section = f"{prefix}.{child_no}" if prefix else str(child_no)
+            yield from walk_parts(child, section)
+        return
+
+    section = prefix or "1"
+    ctype = f"{structure[0]}/{structure[1]}".lower()
+    params = _params(structure[2])
+    encoding = (structure[5] or "7bit").lower()
+    size = int(structure[6]) if str(structure[6]).isdigit() else 0
+
+    if ctype == "message/rfc822" and len(structure) > 8:
+        # Forwarded message: descend into the encapsulated body
+        nested = structure[8]
+        if isinstance(nested, list) and nested and isinstance(nested[0], list):
+            yield from walk_parts(nested, section)
+        else:
+            yield from walk_parts(nested, f"{section}.1")
+        return
+
+    ext_start = 8 if ctype.startswith("text/") else 7
+    disposition = None
+    disp_params = {}
+    disp = structure[ext_start + 1] if len(structure) > ext_start + 1 else None
+    if isinstance(disp, list) and disp:
+        disposition = str(disp[0]).lower()
+        disp_params = _params(disp[1] if len(disp) > 1 else None)
+
+    yield {
+        "section": section,
+        "content_type": ctype,
+        "charset": params.get("charset"),
+        "encoding": encoding,
+        "size": size,
+        "disposition": disposition,
+        "filename": _decode_filename(disp_params) or _decode_filename(params),
+    }
+
+
+# ------------------------------------------------------------------
+# SECTION FETCH / STREAMING DECODE
+# ------------------------------------------------------------------
+
+class _StreamDecoder:
+    """
+    Incremental Content-Transfer-Encoding decoder.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self._tail = b""
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._tail + data
+        self._tail = b""
+
+        if self.encoding == "base64":
+            data = b"".join(data.split())
+            usable = len(data) - len(data) % 4
+            self._tail = data[usable:]
+            return binascii.a2b_base64(data[:usable]) if usable else b""
+
+        if self.encoding == "quoted-printable":
+            cut = data.rfind(b"\n") + 1
+            self._tail = data[cut:]
+            return binascii.a2b_qp(data[:cut])
+
+        return data
+
+    def flush(self) -> bytes:
+        tail, self._tail = self._tail, b""
+        if not tail:
+            return b""
+        if self.encoding == "base64":
+            return binascii.a2b_base64(tail + b"=" * (-len(tail) % 4))
+        if self.encoding == "quoted-printable":
+            return binascii.a2b_qp(tail)
+        return tail
+
+
+def _fetch_literal(mail, uid, section, offset, size):
+    typ, data = mail.uid("FETCH", uid, f"(BODY.PEEK[{section}]<{offset}.{size}>)")
+    if typ != "OK":
+        raise RuntimeError(f"FETCH BODY[{section}] failed for UID {uid}")
+
+    for message in parse_fetch_response(data):
+        for key, value in message.items():
+            if key.startswith("BODY["):
+                if isinstance(value, bytes):
+                    return value
+                return (value or "").encode("utf-8")
+    return b""
+
+
+def iter_section(mail, uid, part, chunk_size=PART_CHUNK_BYTES):
+    """
+    Yield the decoded bytes of one MIME section, fetched in
+    `chunk_size` partial fetches so the whole part is never in memory.
+    """
+    decoder = _StreamDecoder(part["encoding"])
+    offset = 0
+
+    while True:
+        raw = _fetch_literal(mail, uid, part["section"], offset, chunk_size)
+        decoded = decoder.feed(raw)
+        if decoded:
+            yield decoded
+
+        offset += len(raw)
+        if len(raw) < chunk_size or (part["size"] and offset >= part["size"]):
+            break
+
+    tail = decoder.flush()
+    if tail:
+        yield tail
+
+
+def fetch_text_section(mail, uid, part) -> str:
+    """
+    Fetch a (small) text section completely and decode it to str.
+    """
+    decoded = b"".join(iter_section(mail, uid, part))
+    try:
+        return decoded.decode(part.get("charset") or "utf-8", errors="ignore")
+    except LookupError:
+        logger.warning(f"Unknown charset {part.get('charset')}, using utf-8")
+        return decoded.decode("utf-8", errors="ignore")
@@ -9,14 +9,22 @@ Flow:
 """
 
 import os
+import re
+import time
+import hashlib
 import imaplib
 import email
 import datetime
 from pathlib import Path
-from bs4 import BeautifulSoup
 import pandas as pd
 
 from django.conf import settings
+from importer.models import RawFile, MailboxCheckpoint, IngestedMessage
+from importer.extraction.router import UnifiedImporter
+from importer.extraction.html_body import extract_html_body
+from importer.services.process_file import save_extracted_payload
+from importer.connectors import bodystructure, attachment_policy
+from importer.services import content_store
 from config.logger import logger
 
 
@@ -31,6 +39,32 @@ EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 MAILBOX = os.getenv("EMAIL_MAILBOX", "INBOX")
 SEARCH_CRITERIA = os.getenv("EMAIL_SEARCH_CRITERIA", "(UNSEEN)")
 
+# "checkpoint" → fetch UIDs above the stored MailboxCheckpoint
+# "search"     → legacy SEARCH with EMAIL_SEARCH_CRITERIA (flag based)
+SYNC_MODE = os.getenv("EMAIL_SYNC_MODE", "checkpoint").lower()
+
+# "rfc822"        → download whole messages
+# "bodystructure" → download only body text + parseable attachments
+FETCH_MODE = os.getenv("EMAIL_FETCH_MODE", "rfc822").lower()
+
+_HEADER_FETCH = "BODY.PEEK[HEADER.FIELDS (SUBJECT FROM)]"
+_LEDGER_FETCH = "BODY.PEEK[HEADER.FIELDS (MESSAGE-ID FROM)]"
+
+# "memory" → body tables go straight to the extraction pipeline
+# "file"   → body tables are written to raw_files as .xlsx (legacy)
+BODY_HANDOFF = os.getenv("EMAIL_BODY_HANDOFF", "memory").lower()
+
+# Keep an .xlsx copy of in-memory body tables in media/processed
+WRITE_AUDIT_XLSX = os.getenv("EMAIL_WRITE_AUDIT_XLSX", "false").lower() in ("1", "true", "yes")
+
+# RawFile.file_type of in-memory body handoffs (no source file on disk)
+BODY_FILE_TYPE = "email_body"
+
+# Messages fetched (and flagged \Seen) per IMAP round trip
+FETCH_BATCH_SIZE = int(os.getenv("EMAIL_FETCH_BATCH_SIZE", 50))
+
+_UID_RE = re.compile(rb"UID (\d+)")
+
 
 # ------------------------------------------------------------------
 # HELPERS
@@ -43,19 +77,39 @@ def _safe_filename(name: str) -> str:
 # --------------------------
 # Save attachment to raw_files
 # --------------------------
-def save_attachment_to_media(part):
-    filename = part.get_filename() or f"attachment_{datetime.datetime.now().timestamp()}.bin"
-    filename = _safe_filename(filename)
+def _attachment_name(filename, content_type=None):
+    filename = filename or (
+        f"attachment_{datetime.datetime.now().timestamp()}"
+        f"{attachment_policy.attachment_extension(None, content_type) or '.bin'}"
+    )
+    return _safe_filename(filename)
 
-    raw_dir = Path(settings.MEDIA_ROOT) / "raw_files"
-    raw_dir.mkdir(parents=True, exist_ok=True)
 
-    file_path = raw_dir / filename
-    with open(file_path, "wb") as f:
-        f.write(part.get_payload(decode=True))
+def _skip_attachment(filename, reason):
+    logger.info(f"Skipping attachment {filename or '(unnamed)'}: {reason}")
+
+
+def save_attachment_to_media(part, payload=None):
+    if payload is None:
+        payload = part.get_payload(decode=True)
+
+    file_path, sha256 = content_store.store_bytes(
+        payload,
+        _attachment_name(part.get_filename(), part.get_content_type()),
+    )
 
     logger.info(f"Saved email attachment → {file_path}")
-    return file_path
+    return file_path, sha256
+
+
+# --------------------------
+# Stream attachment chunks to raw_files
+# --------------------------
+def save_attachment_stream(filename, chunks):
+    file_path, sha256 = content_store.store_stream(chunks, _attachment_name(filename))
+
+    logger.info(f"Streamed email attachment → {file_path}")
+    return file_path, sha256
 
 
 # --------------------------
@@ -83,11 +137,9 @@ def extract_body_text(message) -> str:
             )
 
         elif ctype == "text/html" and not html_text:
-            soup = BeautifulSoup(
-                payload.decode("utf-8", errors="ignore"),
-                "html.parser",
-            )
-            html_text = soup.get_text(" ")
+            html_text = extract_html_body(
+                payload.decode("utf-8", errors="ignore")
+            )["text"]
 
     # ✅ Prefer plain text, fallback to HTML
     return (plain_text or html_text or "").strip()
@@ -96,105 +148,32 @@ def extract_body_text(message) -> str:
 # --------------------------
 # Save email body to Excel file
 # --------------------------
-def save_email_body_to_excel(body_text: str, subject: str, uid):
+def _email_filename(kind, subject, uid):
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     safe_subject = _safe_filename(subject or "email")
-    filename = f"email_body_{safe_subject}_{uid}_{ts}.xlsx"
+    return f"{kind}_{safe_subject}_{uid}_{ts}.xlsx"
 
-    raw_dir = Path(settings.MEDIA_ROOT) / "raw_files"
-    raw_dir.mkdir(parents=True, exist_ok=True)
-    file_path = raw_dir / filename
 
+def _body_dataframe(body_text):
     # Convert body text → rows
     lines = [line.strip() for line in body_text.splitlines() if line.strip()]
-    df = pd.DataFrame(lines, columns=["email_text"])
-
-    df.to_excel(file_path, index=False)
-    logger.info(f"Saved email body as Excel → {file_path}")
-
-    return file_path
-
-
-# ------------------------------------------------------------------
-# MAIN EMAIL PROCESSOR
-# ------------------------------------------------------------------
-
-def process_email_message(msg_bytes, uid=None):
-    msg = email.message_from_bytes(msg_bytes)
-    subject = msg.get("Subject", "no_subject")
-
-    logger.info(f"Processing Email: {subject}")
-
-    # 1️⃣ Save attachments
-    for part in msg.walk():
-        if part.get_content_disposition() == "attachment":
-            save_attachment_to_media(part)
-
-    # 2️⃣ Save FULL email body as Excel (always)
-    body_text = extract_body_text(msg)
-    if body_text:
-        save_email_body_to_excel(body_text, subject, uid)
-    else:
-        logger.info("Email has no body content")
-
-
-# ------------------------------------------------------------------
-# FETCH EMAILS FROM SERVER
-# ------------------------------------------------------------------
-import os
-import imaplib
-import email
-import datetime
-from pathlib import Path
-from bs4 import BeautifulSoup
-import pandas as pd
-
-from django.conf import settings
-from config.logger import logger
-
-
-# ------------------------------------------------------------------
-# IMAP CONFIG
-# ------------------------------------------------------------------
-
-IMAP_HOST = os.getenv("EMAIL_IMAP_HOST")
-IMAP_PORT = int(os.getenv("EMAIL_IMAP_PORT", 993))
-EMAIL_USER = os.getenv("EMAIL_USER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-MAILBOX = os.getenv("EMAIL_MAILBOX", "INBOX")
-SEARCH_CRITERIA = os.getenv("EMAIL_SEARCH_CRITERIA", "(UNSEEN)")
-
-
-# ------------------------------------------------------------------
-# HELPERS
-# ------------------------------------------------------------------
+    return pd.DataFrame(lines, columns=["email_text"])
 
-def _safe_filename(name: str) -> str:
-    return "".join(c for c in name if c.isalnum() or c in ("_", "-", "."))[:80]
-
-
-# --------------------------
-# Save attachment to raw_files
-# --------------------------
-def save_attachment_to_media(part):
-    filename = part.get_filename() or f"attachment_{datetime.datetime.now().timestamp()}.bin"
-    filename = _safe_filename(filename)
 
+def save_email_body_to_excel(body_text: str, subject: str, uid):
     raw_dir = Path(settings.MEDIA_ROOT) / "raw_files"
     raw_dir.mkdir(parents=True, exist_ok=True)
+    file_path = raw_dir / _email_filename("email_body", subject, uid)
 
-    file_path = raw_dir / filename
-    with open(file_path, "wb") as f:
-        f.write(part.get_payload(decode=True))
+    df = _body_dataframe(body_text)
+
+    df.to_excel(file_path, index=False)
+    logger.info(f"Saved email body as Excel → {file_path}")
 
-    logger.info(f"Saved email attachment → {file_path}")
     return file_path
 
 
-# --------------------------
-# Extract email body text (plain + html)
-# --------------------------
-def extract_body_text(message) -> str:
+def extract_body_content(message):
     plain_text = None
     html_text = None
 
@@ -209,193 +188,575 @@ def extract_body_text(message) -> str:
         if not payload:
             continue
 
+        charset = part.get_content_charset() or "utf-8"
+
         if ctype == "text/plain" and not plain_text:
-            plain_text = payload.decode(
-                part.get_content_charset() or "utf-8",
-                errors="ignore",
-            )
+            plain_text = payload.decode(charset, errors="ignore")
 
         elif ctype == "text/html" and not html_text:
-            soup = BeautifulSoup(
-                payload.decode("utf-8", errors="ignore"),
-                "html.parser",
-            )
-            html_text = soup.get_text(" ")
-
-    # ✅ Prefer plain text, fallback to HTML
-    return (plain_text or html_text or "").strip()
+            html_text = payload.decode(charset, errors="ignore")
 
+    return plain_text, html_text
 
-# --------------------------
-# Save email body to Excel file
-# --------------------------
-def save_email_body_to_excel(body_text: str, subject: str, uid):
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_subject = _safe_filename(subject or "email")
-    filename = f"email_body_{safe_subject}{uid}{ts}.xlsx"
+def extract_table_from_html(html_text):
+    tables = extract_html_body(html_text)["tables"]
+    return tables[0] if tables else None
 
+def save_table_to_excel(df, subject, uid, index=0):
     raw_dir = Path(settings.MEDIA_ROOT) / "raw_files"
     raw_dir.mkdir(parents=True, exist_ok=True)
-    file_path = raw_dir / filename
-
-    # Convert body text → rows
-    lines = [line.strip() for line in body_text.splitlines() if line.strip()]
-    df = pd.DataFrame(lines, columns=["email_text"])
+    kind = f"email_table{index}" if index else "email_table"
+    file_path = raw_dir / _email_filename(kind, subject, uid)
 
     df.to_excel(file_path, index=False)
-    logger.info(f"Saved email body as Excel → {file_path}")
+    logger.info(f"Saved email table → {file_path}")
 
     return file_path
 
 
+# --------------------------
+# Hand a body table straight to the extraction pipeline
+# --------------------------
+def handoff_to_pipeline(tables, filename):
+    """
+    Persist in-memory body tables as one RawFile + ExtractedRecords,
+    skipping the .xlsx write and openpyxl re-read. The RawFile has no
+    file unless WRITE_AUDIT_XLSX writes one afterwards (to its
+    media/processed shard); file_type marks it as body-derived.
+    """
+    raw_obj = RawFile.objects.create(file_name=filename, file_type=BODY_FILE_TYPE)
+
+    importer = UnifiedImporter()
+    payload = {"raw_text": "", "raw_json": {"tables": []}, "rows": []}
+    for df in tables:
+        parsed = importer.parse_dataframe(df)
+        payload["raw_json"]["tables"].extend((parsed.get("raw_json") or {}).get("tables", []))
+        payload["rows"].extend(parsed.get("rows", []))
+
+    save_extracted_payload(raw_obj, payload)
+
+    logger.info(
+        f"Email body handed to pipeline → RawFile {raw_obj.id} "
+        f"({len(tables)} tables, {len(payload['rows'])} rows)"
+    )
+
+    if WRITE_AUDIT_XLSX:
+        # Never written to raw_files: shard by the name's hash instead of content
+        relpath = content_store.archive_relpath(
+            filename, hashlib.sha256(filename.encode("utf-8")).hexdigest()
+        )
+        audit_path = Path(settings.MEDIA_ROOT) / relpath
+        audit_path.parent.mkdir(parents=True, exist_ok=True)
+        with pd.ExcelWriter(audit_path) as writer:
+            for idx, df in enumerate(tables):
+                df.to_excel(writer, sheet_name=f"table_{idx}", index=False)
+
+        # update(): save() would re-derive file_type from the .xlsx name
+        RawFile.objects.filter(id=raw_obj.id).update(raw_file=relpath)
+        raw_obj.raw_file.name = relpath
+
+    return raw_obj
+
+
+def process_email_body(subject, plain_text, html_text, uid=None):
+    # One lxml parse gives every data table + the readable text
+    html_body = extract_html_body(html_text) if html_text else {"text": "", "tables": []}
+    tables = [df for df in html_body["tables"] if not df.empty]
+
+    # Tables first
+    if tables:
+        if BODY_HANDOFF == "memory":
+            handoff_to_pipeline(tables, _email_filename("email_table", subject, uid))
+        else:
+            for idx, df in enumerate(tables):
+                save_table_to_excel(df, subject, uid, idx)
+        return
 
-# ------------------------------------------------------------------
-# FETCH EMAILS FROM SERVER
-# ------------------------------------------------------------------
+    # Fallback → save body as text Excel
+    body_text = plain_text or html_body["text"]
+    if body_text.strip():
+        if BODY_HANDOFF == "memory":
+            handoff_to_pipeline(
+                [_body_dataframe(body_text)],
+                _email_filename("email_body", subject, uid),
+            )
+        else:
+            save_email_body_to_excel(body_text, subject, uid)
+    else:
+        logger.info("Email has no body content")
 
-def fetch_and_process_all():
-    logger.info("Connecting to Email Server...")
 
-    mail = imaplib.IMAP4_SSL(IMAP_HOST, IMAP_PORT)
-    mail.login(EMAIL_USER, EMAIL_PASSWORD)
-    mail.select(MAILBOX)
+def process_email_message(msg_bytes, uid=None):
+    """
+    Returns (path, sha256) for every saved attachment.
+    """
+    msg = email.message_from_bytes(msg_bytes)
+    subject = msg.get("Subject", "no_subject")
 
-    typ, data = mail.search(None, SEARCH_CRITERIA)
-    if typ != "OK":
-        logger.error("Email search failed")
-        return
+    logger.info(f"Processing Email: {subject}")
 
-    uids = data[0].split()
-    logger.info(f"Found {len(uids)} unread emails.")
+    # 1️⃣ Save attachments that pass the attachment policy
+    stored = []
+    sender_rejected = attachment_policy.check_sender(msg.get("From"))
 
-    for uid in uids:
-        typ, msg_data = mail.fetch(uid, "(RFC822)")
-        if typ != "OK":
-            logger.error(f"Failed to fetch email {uid}")
+    for part in msg.walk():
+        if part.get_content_disposition() != "attachment":
             continue
 
-        msg_bytes = msg_data[0][1]
-        process_email_message(msg_bytes, uid)
+        filename = part.get_filename()
+        if sender_rejected:
+            _skip_attachment(filename, sender_rejected)
+            continue
 
-        # Mark email as seen
-        mail.store(uid, "+FLAGS", "\\Seen")
+        # Name and type first, so a rejected part is never decoded
+        content_type = part.get_content_type()
+        reason = attachment_policy.check_part(filename, content_type)
+        if reason:
+            _skip_attachment(filename, reason)
+            continue
 
-    mail.logout()
-    logger.info("Email fetch complete.")
+        payload = part.get_payload(decode=True) or b""
+        reason = (
+            attachment_policy.check_part(filename, content_type, len(payload))
+            or attachment_policy.check_magic(filename, content_type, payload)
+        )
+        if reason:
+            _skip_attachment(filename, reason)
+            continue
 
-def extract_body_content(message):
-    plain_text = None
-    html_text = None
+        stored.append(save_attachment_to_media(part, payload))
 
-    for part in message.walk():
-        ctype = part.get_content_type()
-        disp = str(part.get("Content-Disposition") or "")
+    # 2️⃣ Extract body
+    plain_text, html_text = extract_body_content(msg)
 
-        if "attachment" in disp:
-            continue
+    # 3️⃣ Table or text body → Excel
+    process_email_body(subject, plain_text, html_text, uid)
 
-        payload = part.get_payload(decode=True)
-        if not payload:
-            continue
+    return stored
 
-        charset = part.get_content_charset() or "utf-8"
 
-        if ctype == "text/plain" and not plain_text:
-            plain_text = payload.decode(charset, errors="ignore")
+def _decoded_size(part) -> int:
+    # BODYSTRUCTURE reports the encoded size
+    if part["encoding"] == "base64":
+        return part["size"] * 3 // 4
+    return part["size"]
 
-        elif ctype == "text/html" and not html_text:
-            html_text = payload.decode(charset, errors="ignore")
 
-    return plain_text, html_text
+def process_email_structure(mail, uid, fetched):
+    """
+    BODYSTRUCTURE mode: download only the body text and the
+    attachments that pass the attachment policy, section by section.
+    Returns (path, sha256) for every saved attachment.
+    """
+    header_bytes = next(
+        (v for k, v in fetched.items() if k.startswith("BODY[HEADER")),
+        b"",
+    )
+    if isinstance(header_bytes, str):
+        header_bytes = header_bytes.encode("utf-8")
 
-def extract_table_from_html(html_text):
-    soup = BeautifulSoup(html_text, "html.parser")
-    table = soup.find("table")
+    header = email.message_from_bytes(header_bytes or b"")
+    subject = header.get("Subject", "no_subject")
 
-    if not table:
-        return None
+    logger.info(f"Processing Email: {subject}")
 
-    rows = []
-    for tr in table.find_all("tr"):
-        cols = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
-        if cols:
-            rows.append(cols)
+    plain_part = html_part = None
+    stored = []
+    sender_rejected = attachment_policy.check_sender(header.get("From"))
 
-    if len(rows) < 2:
-        return None
+    for part in bodystructure.walk_parts(fetched.get("BODYSTRUCTURE")):
+        if part["disposition"] == "attachment":
+            # Rejected parts are never fetched
+            reason = sender_rejected or attachment_policy.check_part(
+                part["filename"], part["content_type"], _decoded_size(part)
+            )
+            if reason:
+                _skip_attachment(part["filename"], reason)
+                continue
+
+            chunks = attachment_policy.checked_stream(
+                bodystructure.iter_section(mail, uid, part),
+                part["filename"],
+                part["content_type"],
+            )
+            try:
+                stored.append(save_attachment_stream(
+                    _attachment_name(part["filename"], part["content_type"]),
+                    chunks,
+                ))
+            except attachment_policy.AttachmentRejected as e:
+                _skip_attachment(part["filename"], e)
+            continue
 
-    headers = rows[0]
-    data = rows[1:]
+        if part["content_type"] == "text/plain" and plain_part is None:
+            plain_part = part
+        elif part["content_type"] == "text/html" and html_part is None:
+            html_part = part
 
-    return pd.DataFrame(data, columns=headers)
+    plain_text = bodystructure.fetch_text_section(mail, uid, plain_part) if plain_part else None
+    html_text = bodystructure.fetch_text_section(mail, uid, html_part) if html_part else None
 
-def save_table_to_excel(df, subject, uid):
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_subject = _safe_filename(subject or "email")
-    filename = f"email_table_{safe_subject}_{uid}_{ts}.xlsx"
+    process_email_body(subject, plain_text, html_text, uid)
 
-    raw_dir = Path(settings.MEDIA_ROOT) / "raw_files"
-    raw_dir.mkdir(parents=True, exist_ok=True)
-    file_path = raw_dir / filename
+    return stored
 
-    df.to_excel(file_path, index=False)
-    logger.info(f"Saved email table → {file_path}")
 
-    return file_path
+# ------------------------------------------------------------------
+# FETCH EMAILS FROM SERVER
+# ------------------------------------------------------------------
 
-def process_email_message(msg_bytes, uid=None):
-    msg = email.message_from_bytes(msg_bytes)
-    subject = msg.get("Subject", "no_subject")
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _uid_set(uids) -> str:
+    """
+    Compress a list of UIDs into an IMAP sequence set
+    (e.g. [1, 2, 3, 7] → "1:3,7") so a chunk is a single command.
+    """
+    ordered = sorted(int(u) for u in uids)
+    if not ordered:
+        return ""
+
+    ranges = []
+    start = prev = ordered[0]
+    for uid in ordered[1:]:
+        if uid == prev + 1:
+            prev = uid
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = uid
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+
+    return ",".join(ranges)
+
+
+def _iter_fetch_response(msg_data):
+    """
+    Yield (uid, message_bytes) from a multi-message UID FETCH response.
+
+    imaplib returns a flat list where every message is a
+    (b"<seq> (UID <uid> BODY[] {<size>}", b"<literal>") tuple followed
+    by a closing b")" — some servers send the UID after the literal.
+    """
+    pending = None
+
+    for item in msg_data:
+        if isinstance(item, tuple):
+            if pending is not None:
+                yield pending
+            header, literal = item[0], item[1]
+            match = _UID_RE.search(header)
+            pending = [match.group(1) if match else None, literal]
+            continue
 
-    logger.info(f"Processing Email: {subject}")
+        if pending is None:
+            continue
 
-    # 1️⃣ Save attachments
-    for part in msg.walk():
-        if part.get_content_disposition() == "attachment":
-            save_attachment_to_media(part)
+        if pending[0] is None and isinstance(item, bytes):
+            match = _UID_RE.search(item)
+            if match:
+                pending[0] = match.group(1)
+
+        yield tuple(pending)
+        pending = None
+
+    if pending is not None:
+        yield tuple(pending)
+
+
+def default_account() -> dict:
+    """
+    The single account configured through EMAIL_* environment variables.
+    """
+    return {
+        "name": EMAIL_USER,
+        "host": IMAP_HOST,
+        "port": IMAP_PORT,
+        "use_ssl": True,
+        "user": EMAIL_USER,
+        "password": EMAIL_PASSWORD,
+        "mailboxes": [MAILBOX],
+    }
+
+
+def connect(account=None):
+    """
+    Open an authenticated IMAP connection
+    (defaults to the EMAIL_* environment account).
+    """
+    account = account or default_account()
+    logger.info(f"Connecting to Email Server {account['host']} as {account['user']}...")
+
+    imap_class = imaplib.IMAP4_SSL if account.get("use_ssl", True) else imaplib.IMAP4
+    mail = imap_class(account["host"], account["port"])
+    mail.login(account["user"], account["password"])
+    return mail
+
+
+def _select_mailbox(mail, mailbox):
+    """
+    SELECT the mailbox and return its UIDVALIDITY (None if unknown).
+    """
+    typ, _ = mail.select(mailbox)
+    if typ != "OK":
+        raise imaplib.IMAP4.error(f"Cannot select mailbox {mailbox}")
+
+    _, data = mail.response("UIDVALIDITY")
+    if not data or data[0] is None:
+        typ, data = mail.status(mailbox, "(UIDVALIDITY)")
+        match = re.search(rb"UIDVALIDITY (\d+)", data[0] or b"") if typ == "OK" else None
+        return int(match.group(1)) if match else None
+
+    return int(data[0])
+
+
+def _load_checkpoint(account, mailbox, uidvalidity):
+    """
+    Return the checkpoint for this mailbox, resetting it to a full
+    resync when the server reports a new UIDVALIDITY.
+    """
+    checkpoint, _ = MailboxCheckpoint.objects.get_or_create(
+        account=account,
+        mailbox=mailbox,
+    )
+
+    if checkpoint.uidvalidity != uidvalidity:
+        if checkpoint.uidvalidity is not None:
+            logger.warning(
+                f"UIDVALIDITY changed for {account}/{mailbox} "
+                f"({checkpoint.uidvalidity} → {uidvalidity}), full resync"
+            )
+        checkpoint.uidvalidity = uidvalidity
+        checkpoint.last_uid = 0
+        checkpoint.failed_uids = []
+        checkpoint.save(update_fields=["uidvalidity", "last_uid", "failed_uids", "updated_at"])
 
-    # 2️⃣ Extract body
-    plain_text, html_text = extract_body_content(msg)
+    return checkpoint
 
-    # 3️⃣ Try extracting table first
-    if html_text:
-        df = extract_table_from_html(html_text)
-        if df is not None:
-            save_table_to_excel(df, subject, uid)
-            return
 
-    # 4️⃣ Fallback → save body as text Excel
-    body_text = plain_text or ""
-    if body_text.strip():
-        save_email_body_to_excel(body_text, subject, uid)
+def _search_uids(mail, checkpoint):
+    if checkpoint is None:
+        typ, data = mail.uid("SEARCH", None, SEARCH_CRITERIA)
     else:
-        logger.info("Email has no body content")
-def fetch_and_process_all():
-    logger.info("Connecting to Email Server...")
-
-    mail = imaplib.IMAP4_SSL(IMAP_HOST, IMAP_PORT)
-    mail.login(EMAIL_USER, EMAIL_PASSWORD)
-    mail.select(MAILBOX)
+        typ, data = mail.uid("SEARCH", None, f"UID {checkpoint.last_uid + 1}:*")
 
-    typ, data = mail.search(None, SEARCH_CRITERIA)
     if typ != "OK":
-        logger.error("Email search failed")
-        return
+        return None
 
     uids = data[0].split()
-    logger.info(f"Found {len(uids)} unread emails.")
 
-    for uid in uids:
-        typ, msg_data = mail.fetch(uid, "(RFC822)")
-        if typ != "OK":
-            logger.error(f"Failed to fetch email {uid}")
-            continue
-
-        msg_bytes = msg_data[0][1]
-        process_email_message(msg_bytes, uid)
-
-        # Mark email as seen
-        mail.store(uid, "+FLAGS", "\\Seen")
+    # "n:*" always matches the newest message, even when its UID is <= n.
+    # Earlier failures go first: the mark has already moved past them
+    if checkpoint is not None:
+        retry = [str(u).encode() for u in sorted(checkpoint.failed_uids) if u <= checkpoint.last_uid]
+        uids = retry + [u for u in uids if int(u) > checkpoint.last_uid]
+
+    return uids
+
+
+def _advance_checkpoint(checkpoint, chunk, failed):
+    """
+    Move the mark past `chunk` whatever became of its messages. The
+    ones that failed are kept in failed_uids and retried next run, so
+    a message that always fails cannot hold the mark back.
+    """
+    attempted = {int(u) for u in chunk}
+    checkpoint.last_uid = max(checkpoint.last_uid, *attempted)
+    checkpoint.failed_uids = sorted(
+        (set(checkpoint.failed_uids) - attempted) | {int(u) for u in failed}
+    )
+    checkpoint.save(update_fields=["last_uid", "failed_uids", "updated_at"])
+
+
+def _ledger_key(message_id, account, mailbox, uidvalidity, uid):
+    message_id = (message_id or "").strip()
+    if not message_id:
+        # No Message-ID: the UID is only unique within this UIDVALIDITY
+        message_id = f"uid:{account}/{mailbox}/{uidvalidity}/{uid}"
+    if len(message_id) > 255:
+        message_id = "sha256:" + hashlib.sha256(message_id.encode()).hexdigest()
+    return message_id
+
+
+def _fetch_ledger_keys(mail, uid_set, account, mailbox, uidvalidity):
+    """
+    One header-only round trip per chunk: UID → (ledger key, sender).
+    """
+    typ, data = mail.uid("FETCH", uid_set, f"(UID {_LEDGER_FETCH})")
+    if typ != "OK":
+        return None
 
-    mail.logout()
-    logger.info("Email fetch complete.")
+    keys = {}
+    for fetched in bodystructure.parse_fetch_response(data):
+        uid = fetched.get("UID")
+        header_bytes = next(
+            (v for k, v in fetched.items() if k.startswith("BODY[HEADER")),
+            b"",
+        )
+        if isinstance(header_bytes, str):
+            header_bytes = header_bytes.encode("utf-8")
+        header = email.message_from_bytes(header_bytes or b"")
+
+        keys[uid] = (
+            _ledger_key(header.get("Message-ID"), account, mailbox, uidvalidity, uid),
+            str(header.get("From") or "")[:255],
+        )
+    return keys
+
+
+def _record_ingested(key, sender, account, mailbox, uidvalidity, uid, hashes):
+    IngestedMessage.objects.get_or_create(
+        message_id=key,
+        defaults={
+            "account": account,
+            "mailbox": mailbox,
+            "uidvalidity": uidvalidity,
+            "uid": int(uid) if uid else None,
+            "sender": sender,
+            "attachment_hashes": hashes,
+        },
+    )
+
+
+def sync_mailbox(mail, account, mailbox, batch_size=None, fetch_mode=None, on_stored=None):
+    """
+    Ingest new messages from an authenticated connection.
+
+    In checkpoint mode only UIDs above the stored high-water mark are
+    fetched, plus the UIDs that failed before; those are retried on
+    every run until they process cleanly. Messages already
+    in the IngestedMessage ledger are skipped before their body is
+    downloaded. `on_stored(path)` is called for every attachment of a
+    message once that message has been ingested.
+    """
+    batch_size = max(1, int(batch_size or FETCH_BATCH_SIZE))
+    fetch_mode = (fetch_mode or FETCH_MODE).lower()
+    stats = {"messages": 0, "failed": 0, "skipped": 0}
+
+    uidvalidity = _select_mailbox(mail, mailbox)
+    checkpoint = None
+    if SYNC_MODE == "checkpoint":
+        checkpoint = _load_checkpoint(account, mailbox, uidvalidity)
+
+    uids = _search_uids(mail, checkpoint)
+    if uids is None:
+        logger.error("Email search failed")
+        return stats
+
+    logger.info(
+        f"Found {len(uids)} new emails in {account}/{mailbox} "
+        f"(batch size {batch_size})."
+    )
+
+    for chunk in _chunks(uids, batch_size):
+        keys = _fetch_ledger_keys(mail, _uid_set(chunk), account, mailbox, uidvalidity) or {}
+        ingested = set(
+            IngestedMessage.objects
+            .filter(message_id__in=[key for key, _ in keys.values()])
+            .values_list("message_id", flat=True)
+        )
+
+        # Already ingested (earlier run, retry, or another folder): no download
+        done = [u.decode() for u in chunk if keys.get(u.decode(), ("",))[0] in ingested]
+        stats["skipped"] += len(done)
+        pending = [u for u in chunk if u.decode() not in done]
+
+        messages = []
+        failed = []
+        if pending:
+            uid_set = _uid_set(pending)
+
+            if fetch_mode == "bodystructure":
+                items = f"(UID BODYSTRUCTURE {_HEADER_FETCH})"
+            else:
+                # PEEK: \Seen is only set by the STORE below, for messages
+                # that were processed successfully
+                items = "(UID BODY.PEEK[])"
+
+            typ, msg_data = mail.uid("FETCH", uid_set, items)
+            if typ != "OK":
+                logger.error(f"Failed to fetch emails {uid_set}")
+                stats["failed"] += len(pending)
+                failed = [u.decode() for u in pending]
+            elif fetch_mode == "bodystructure":
+                messages = [(m.get("UID"), m) for m in bodystructure.parse_fetch_response(msg_data)]
+            else:
+                messages = [
+                    (uid.decode() if uid else None, msg_bytes)
+                    for uid, msg_bytes in _iter_fetch_response(msg_data)
+                ]
+
+        for uid, message in messages:
+            try:
+                if fetch_mode == "bodystructure":
+                    stored = process_email_structure(mail, uid, message)
+                else:
+                    stored = process_email_message(message, uid)
+
+                key, sender = keys.get(uid) or (
+                    _ledger_key(None, account, mailbox, uidvalidity, uid), ""
+                )
+                _record_ingested(
+                    key, sender, account, mailbox, uidvalidity, uid,
+                    [sha256 for _, sha256 in stored],
+                )
+
+                stats["messages"] += 1
+                if uid:
+                    done.append(uid)
+            except Exception as e:
+                logger.exception(f"Error processing email {uid}: {e}")
+                stats["failed"] += 1
+                if uid:
+                    failed.append(uid)
+                continue
+
+            # Hand the attachments to extraction while the fetch goes on
+            if on_stored is not None:
+                for path, _ in stored:
+                    on_stored(path)
+
+        # Mark the whole chunk as seen in one round trip
+        if done:
+            mail.uid("STORE", _uid_set(done), "+FLAGS", "(\\Seen)")
+
+        if checkpoint is not None:
+            _advance_checkpoint(checkpoint, chunk, failed)
+
+    return stats
+
+
+def fetch_and_process_all(batch_size=None, account=None, fetch_mode=None):
+    """
+    Fetch new emails in UID chunks and hand each one to
+    process_email_message (defaults to the EMAIL_* account).
+
+    Every chunk costs one FETCH and one STORE round trip instead of
+    two per message. Returns run statistics for the caller to report.
+    """
+    started = time.monotonic()
+
+    account = account or default_account()
+    mail = connect(account)
+
+    try:
+        stats = sync_mailbox(
+            mail,
+            account["user"],
+            account["mailboxes"][0],
+            batch_size,
+            fetch_mode,
+        )
+    finally:
+        mail.logout()
+
+    stats["seconds"] = time.monotonic() - started
+    stats["rate"] = stats["messages"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+
+    logger.info(
+        f"Email fetch complete: {stats['messages']} messages in "
+        f"{stats['seconds']:.1f}s ({stats['rate']:.1f} msg/s)."
+    )
+    return stats
@@ -0,0 +1,141 @@
+"""
+Producer/consumer bridge between the email fetch and extraction.
+
+The IMAP threads submit each saved attachment to a bounded queue and a
+pool of extraction threads drains it while the fetch is still running.
+When the queue is full `submit` blocks, so a slow parser holds the
+download back instead of letting files pile up.
+"""
+
+import os
+import time
+import queue
+import threading
+from pathlib import Path
+
+from django.db import connection
+
+from importer.connectors.raw_folder_processor import process_raw_path
+from config.logger import logger
+
+
+# Extraction threads draining the queue
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", 4))
+
+# Files waiting for extraction before the fetch is held back
+PIPELINE_QUEUE_SIZE = int(os.getenv("EXTRACT_QUEUE_SIZE", 32))
+
+# Seconds between worker liveness checks while a put() waits on a full queue
+_PUT_POLL = 1.0
+
+_STOP = object()
+
+
+class ExtractionPipeline:
+    """
+    with ExtractionPipeline() as pipeline:
+        fetch_all_mailboxes(on_stored=pipeline.submit)
+    """
+
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = max(1, workers or EXTRACT_WORKERS)
+        self._queue = queue.Queue(maxsize=max(1, queue_size or PIPELINE_QUEUE_SIZE))
+
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._threads = []
+
+        self.started = None
+        self.first_done = None
+        self.stats = {"ok": 0, "failed": 0}
+
+    # ---------------------------------------------
+    # PRODUCER SIDE
+    # ---------------------------------------------
+    def start(self):
+        self.started = time.monotonic()
+        for n in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker,
+                name=f"extract-{n}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, path):
+        path = Path(path)
+        with self._lock:
+            # Identical attachments share one content-addressed path
+            if path in self._in_flight:
+                return
+            self._in_flight.add(path)
+
+        self._put(path)  # blocks while the queue is full
+
+    def close(self):
+        """
+        Wait for the queue to drain and stop the workers.
+        """
+        for _ in self._threads:
+            try:
+                self._put(_STOP)
+            except RuntimeError:
+                break  # nobody left to stop
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _put(self, item):
+        # A full queue with no live consumer would block forever
+        while True:
+            try:
+                self._queue.put(item, timeout=_PUT_POLL)
+                return
+            except queue.Full:
+                if not any(thread.is_alive() for thread in self._threads):
+                    raise RuntimeError("All extraction workers have stopped; queue is full")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------------------------------------
+    # CONSUMER SIDE
+    # ---------------------------------------------
+    def _worker(self):
+        try:
+            while True:
+                path = self._queue.get()
+                if path is _STOP:
+                    break
+
+                try:
+                    status = process_raw_path(path)
+                except Exception as e:
+                    # Keep draining: a dead worker would stall submit()/close()
+                    logger.exception(f"Extraction worker failed on {path.name}: {e}")
+                    status = "failed"
+
+                with self._lock:
+                    self._in_flight.discard(path)
+                    if status in self.stats:
+                        self.stats[status] += 1
+                    if status == "ok" and self.first_done is None:
+                        self.first_done = time.monotonic()
+                        logger.info(
+                            f"First file extracted {self.first_done - self.started:.1f}s "
+                            f"after fetch start: {path.name}"
+                        )
+        finally:
+            # Each worker thread owns its own DB connection
+            connection.close()
+
+    @property
+    def first_latency(self):
+        if self.first_done is None:
+            return None
+        return self.first_done - self.started
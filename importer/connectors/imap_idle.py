@@ -0,0 +1,180 @@
+"""
+IMAP IDLE push listener (long-running).
+
+Flow:
+1. Open one authenticated connection and sync new mail
+2. Park the connection in IDLE until the server reports EXISTS
+3. Sync again (checkpoint based) and hand files to the raw processor
+4. Reconnect with exponential backoff when the connection drops
+"""
+
+import os
+import time
+import ssl
+import select
+import imaplib
+
+from django.db import close_old_connections
+from config.logger import logger
+
+from importer.connectors import email_reader
+
+
+# Servers drop IDLE after ~30 minutes (RFC 2177), so re-issue it earlier.
+IDLE_TIMEOUT = int(os.getenv("EMAIL_IDLE_TIMEOUT", 600))
+RECONNECT_BACKOFF_MAX = int(os.getenv("EMAIL_RECONNECT_BACKOFF_MAX", 300))
+POLL_INTERVAL = int(os.getenv("EMAIL_POLL_INTERVAL", 60))
+
+
+def _buffered(mail) -> bool:
+    """
+    True if imaplib's reader already holds unread bytes, e.g. an EXISTS
+    that arrived in the same packet as "+ idling". select() on the
+    socket cannot see those.
+    """
+    sock = mail.sock
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def _wait_readable(mail, timeout) -> bool:
+    if _buffered(mail):
+        return True
+
+    sock = mail.sock
+    if hasattr(sock, "pending") and sock.pending():
+        return True
+    readable, _, _ = select.select([sock], [], [], timeout)
+    return bool(readable)
+
+
+def idle_wait(mail, timeout=IDLE_TIMEOUT) -> bool:
+    """
+    Issue IDLE on the selected mailbox and block until the server
+    announces new mail or the timeout expires.
+
+    Returns True when an EXISTS/RECENT update was seen.
+    """
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+
+    has_new_mail = False
+
+    # Untagged updates may arrive before the continuation
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed while entering IDLE")
+        if line.startswith(b"+"):
+            break
+        if line.startswith(b"* BYE"):
+            raise imaplib.IMAP4.abort(line.decode(errors="ignore").strip())
+        if line.startswith(b"*"):
+            if line.endswith(b"EXISTS\r\n") or line.endswith(b"RECENT\r\n"):
+                has_new_mail = True
+            continue
+        raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+
+    deadline = time.monotonic() + timeout
+
+    while not has_new_mail:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not _wait_readable(mail, remaining):
+            break
+
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed during IDLE")
+
+        if line.startswith(b"* BYE"):
+            raise imaplib.IMAP4.abort(line.decode(errors="ignore").strip())
+
+        if line.endswith(b"EXISTS\r\n") or line.endswith(b"RECENT\r\n"):
+            has_new_mail = True
+
+    # Leave IDLE and drain everything up to the tagged completion
+    mail.send(b"DONE\r\n")
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed while leaving IDLE")
+        if line.startswith(tag):
+            break
+        if line.endswith(b"EXISTS\r\n"):
+            has_new_mail = True
+
+    return has_new_mail
+
+
+def listen_for_new_mail(on_ingested=None, batch_size=None, idle_timeout=IDLE_TIMEOUT):
+    """
+    Run forever: keep one connection open, sync on every push
+    notification and reconnect with backoff when it drops.
+
+    `on_ingested(stats)` is called after each sync that ingested mail.
+    """
+    backoff = 1
+
+    while True:
+        mail = None
+        try:
+            mail = email_reader.connect()
+            supports_idle = "IDLE" in mail.capabilities
+
+            if not supports_idle:
+                logger.warning(
+                    f"Server has no IDLE support, polling every {POLL_INTERVAL}s"
+                )
+
+            while True:
+                close_old_connections()
+
+                stats = email_reader.sync_mailbox(
+                    mail,
+                    email_reader.EMAIL_USER,
+                    email_reader.MAILBOX,
+                    batch_size,
+                )
+                if stats["messages"] and on_ingested:
+                    on_ingested(stats)
+
+                # Reset only after a full sync: a connect that keeps
+                # failing the same way right after must still back off
+                backoff = 1
+
+                if supports_idle:
+                    if idle_wait(mail, idle_timeout):
+                        logger.info("IDLE: new mail announced")
+                else:
+                    time.sleep(POLL_INTERVAL)
+                    mail.noop()
+
+        except KeyboardInterrupt:
+            logger.info("Email listener stopped.")
+            break
+
+        except (imaplib.IMAP4.error, OSError) as e:
+            logger.warning(f"IMAP connection lost ({e}); reconnecting in {backoff}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+
+        except Exception as e:
+            # e.g. "database is locked" from the sync or on_ingested;
+            # a long-running listener must outlive it
+            logger.exception(f"Email listener error ({e}); reconnecting in {backoff}s")
+            close_old_connections()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+
+        finally:
+            if mail is not None:
+                try:
+                    mail.logout()
+                except Exception:
+                    pass
@@ -0,0 +1,397 @@
+"""
+Local IMAP stand-in for measuring the ingestion path offline.
+
+Serves a directory of .eml files over plain IMAP4rev1 (the subset the
+reader uses: LOGIN, SELECT, UID SEARCH/FETCH/STORE, IDLE). Messages are
+read from disk per request so the server never holds the corpus in
+memory. Also generates a synthetic corpus with a realistic mix of
+attachments, HTML tables and plain bodies.
+"""
+
+import io
+import re
+import math
+import random
+import socketserver
+import threading
+import multiprocessing
+from pathlib import Path
+from email import message_from_bytes
+from email.parser import BytesParser
+from email.message import EmailMessage
+
+from config.logger import logger
+
+
+UIDVALIDITY = 1
+
+_FETCH_ITEM_RE = re.compile(
+    r"BODY(?:\.PEEK)?\[[^\]]*\](?:<\d+\.\d+>)?|BODYSTRUCTURE|RFC822|UID|FLAGS",
+    re.IGNORECASE,
+)
+
+
+# ------------------------------------------------------------------
+# CORPUS
+# ------------------------------------------------------------------
+
+def _sample_xlsx() -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["PO Number", "ITEM_NO", "DESCRIPTION", "QUANTITY", "Ship Date"])
+    for i in range(50):
+        ws.append([f"PO-{1000 + i}", f"P{i:04d}", f"Part {i}", i * 10, "2025-01-15"])
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _sample_csv(rows=200) -> bytes:
+    lines = ["PO Number,ITEM_NO,DESCRIPTION,QUANTITY"]
+    lines += [f"PO-{2000 + i},P{i:04d},Part {i},{i * 5}" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _html_table(rows=40) -> str:
+    body = "".join(
+        f"<tr><td>PO-{3000 + i}</td><td>P{i:04d}</td><td>{i * 3}</td></tr>"
+        for i in range(rows)
+    )
+    return (
+        "<html><body><p>Please find the schedule below.</p>"
+        "<table><tr><th>PO Number</th><th>ITEM_NO</th><th>QUANTITY</th></tr>"
+        f"{body}</table><p>Regards</p></body></html>"
+    )
+
+
+def generate_corpus(directory, count=100, min_bytes=10 * 1024, max_bytes=50 * 1024 * 1024, seed=42):
+    """
+    Write `count` .eml files to `directory` with sizes spread
+    log-uniformly between min_bytes and max_bytes. Size above the
+    useful content is made up with signature-image style padding.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    xlsx = _sample_xlsx()
+    csv = _sample_csv()
+
+    for i in range(count):
+        target = int(math.exp(rng.uniform(math.log(min_bytes), math.log(max_bytes))))
+        kind = rng.choice(["xlsx", "csv", "html", "plain", "html"])
+
+        msg = EmailMessage()
+        msg["Subject"] = f"Schedule {i} ({kind})"
+        msg["From"] = f"sales{i % 7}@customer{i % 3}.example"
+        msg["To"] = "orders@example.com"
+        msg["Message-ID"] = f"<bench-{seed}-{i}@local>"
+
+        if kind == "html":
+            msg.set_content("Please find the schedule below.")
+            msg.add_alternative(_html_table(), subtype="html")
+        else:
+            msg.set_content(f"Schedule {i}\nPlease process the attached order.")
+
+        if kind == "xlsx":
+            msg.add_attachment(
+                xlsx,
+                maintype="application",
+                subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                filename=f"schedule_{i}.xlsx",
+            )
+        elif kind == "csv":
+            msg.add_attachment(csv, maintype="text", subtype="csv", filename=f"schedule_{i}.csv")
+
+        # Base64 inflates by 4/3, so pad with ~3/4 of the missing size
+        padding = int((target - len(msg.as_bytes())) * 3 / 4)
+        if padding > 0:
+            msg.add_attachment(
+                rng.randbytes(padding),
+                maintype="image",
+                subtype="png",
+                filename=f"signature_{i}.png",
+            )
+
+        (directory / f"{i:06d}.eml").write_bytes(msg.as_bytes())
+
+    logger.info(f"Generated {count} messages in {directory}")
+
+
+# ------------------------------------------------------------------
+# MIME HELPERS
+# ------------------------------------------------------------------
+
+def _quote(value) -> str:
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _encoded_payload(part) -> bytes:
+    payload = part.get_payload()
+    if isinstance(payload, str):
+        return payload.encode("utf-8", errors="surrogateescape")
+    return b""
+
+
+def _bodystructure(part) -> str:
+    if part.is_multipart():
+        children = "".join(_bodystructure(p) for p in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype())})"
+
+    params = part.get_params()[1:] if part.get_params() else []
+    params_str = (
+        "(" + " ".join(f"{_quote(k)} {_quote(v)}" for k, v in params) + ")"
+        if params else "NIL"
+    )
+    body = _encoded_payload(part)
+    fields = (
+        f"{_quote(part.get_content_maintype())} {_quote(part.get_content_subtype())} "
+        f"{params_str} NIL NIL {_quote(part.get('Content-Transfer-Encoding', '7bit'))} {len(body)}"
+    )
+    if part.get_content_maintype() == "text":
+        lines = body.count(b"\n")
+        fields += f" {lines}"
+
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_filename()
+        disp_params = f"({_quote('filename')} {_quote(filename)})" if filename else "NIL"
+        disp = f"({_quote(disposition)} {disp_params})"
+    else:
+        disp = "NIL"
+
+    return f"({fields} NIL {disp} NIL NIL)"
+
+
+def _section(msg, section):
+    part = msg
+    for number in section.split("."):
+        if not part.is_multipart():
+            if number == "1":
+                continue
+            return None
+        children = part.get_payload()
+        idx = int(number) - 1
+        if idx >= len(children):
+            return None
+        part = children[idx]
+    return part
+
+
+# ------------------------------------------------------------------
+# SERVER
+# ------------------------------------------------------------------
+
+def _parse_uid_set(spec, uids):
+    if not uids:
+        return []
+    highest = uids[-1]
+    wanted = set()
+    for piece in spec.split(","):
+        if ":" in piece:
+            a, b = piece.split(":", 1)
+            lo = highest if a == "*" else int(a)
+            hi = highest if b == "*" else int(b)
+            lo, hi = min(lo, hi), max(lo, hi)
+            wanted.update(u for u in uids if lo <= u <= hi)
+        else:
+            value = highest if piece == "*" else int(piece)
+            if value in uids:
+                wanted.add(value)
+    return sorted(wanted)
+
+
+class _IMAPHandler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        self.seen = self.server.seen
+        self._cached = (None, None)
+
+    def _send(self, data: bytes):
+        self.wfile.write(data)
+
+    def _message(self, uid):
+        if self._cached[0] != uid:
+            raw = self.server.paths[uid].read_bytes()
+            self._cached = (uid, message_from_bytes(raw))
+        return self._cached[1]
+
+    def handle(self):
+        self._send(b"* OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] local stand-in ready\r\n")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            parts = line.decode("utf-8", errors="replace").rstrip("\r\n").split(" ", 2)
+            if len(parts) < 2:
+                continue
+
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ""
+            ok = f"{tag} OK {command} completed\r\n".encode()
+
+            if command == "CAPABILITY":
+                self._send(b"* CAPABILITY IMAP4rev1 IDLE UIDPLUS\r\n" + ok)
+            elif command in ("LOGIN", "NOOP", "CHECK"):
+                self._send(ok)
+            elif command in ("SELECT", "EXAMINE"):
+                uids = self.server.uids
+                self._send(
+                    f"* {len(uids)} EXISTS\r\n* 0 RECENT\r\n"
+                    f"* OK [UIDVALIDITY {UIDVALIDITY}] UIDs valid\r\n"
+                    f"* OK [UIDNEXT {(uids[-1] if uids else 0) + 1}] next UID\r\n"
+                    f"{tag} OK [READ-WRITE] {command} completed\r\n".encode()
+                )
+            elif command == "STATUS":
+                self._send(f"* STATUS INBOX (UIDVALIDITY {UIDVALIDITY})\r\n".encode() + ok)
+            elif command == "IDLE":
+                self._send(b"+ idling\r\n")
+                while True:
+                    done = self.rfile.readline()
+                    if not done or done.strip().upper() == b"DONE":
+                        break
+                self._send(ok)
+            elif command == "LOGOUT":
+                self._send(b"* BYE logging out\r\n" + ok)
+                return
+            elif command == "UID":
+                sub, _, rest = args.partition(" ")
+                self._uid_command(tag, sub.upper(), rest)
+            else:
+                self._send(f"{tag} BAD {command} not supported\r\n".encode())
+
+    def _uid_command(self, tag, sub, rest):
+        uids = self.server.uids
+
+        if sub == "SEARCH":
+            tokens = rest.split()
+            found = list(uids)
+            for idx, token in enumerate(tokens):
+                upper = token.upper()
+                if upper == "UID" and idx + 1 < len(tokens):
+                    matching = set(_parse_uid_set(tokens[idx + 1], uids))
+                    found = [u for u in found if u in matching]
+                elif upper == "UNSEEN":
+                    found = [u for u in found if u not in self.seen]
+            self._send(
+                ("* SEARCH " + " ".join(map(str, found))).rstrip().encode()
+                + f"\r\n{tag} OK UID SEARCH completed\r\n".encode()
+            )
+
+        elif sub == "FETCH":
+            spec, _, items = rest.partition(" ")
+            wanted = _FETCH_ITEM_RE.findall(items)
+            matching = set(_parse_uid_set(spec, uids))
+            for seq, uid in enumerate(uids, start=1):
+                if uid in matching:
+                    self._send_fetch(seq, uid, wanted)
+            self._send(f"{tag} OK UID FETCH completed\r\n".encode())
+
+        elif sub == "STORE":
+            spec = rest.split(" ", 1)[0]
+            if "\\SEEN" in rest.upper():
+                self.seen.update(_parse_uid_set(spec, uids))
+            self._send(f"{tag} OK UID STORE completed\r\n".encode())
+
+        else:
+            self._send(f"{tag} BAD UID {sub} not supported\r\n".encode())
+
+    def _send_fetch(self, seq, uid, wanted):
+        chunks = [f"* {seq} FETCH (UID {uid}".encode()]
+
+        for item in wanted:
+            upper = item.upper()
+
+            if upper == "UID":
+                continue
+
+            if upper == "FLAGS":
+                chunks.append(b" FLAGS (\\Seen)" if uid in self.seen else b" FLAGS ()")
+                continue
+
+            if upper == "RFC822":
+                data = self.server.paths[uid].read_bytes()
+                chunks.append(f" RFC822 {{{len(data)}}}\r\n".encode() + data)
+                self.seen.add(uid)
+                continue
+
+            if upper == "BODYSTRUCTURE":
+                chunks.append(b" BODYSTRUCTURE " + _bodystructure(self._message(uid)).encode())
+                continue
+
+            # BODY[...] / BODY.PEEK[...]<offset.size>
+            match = re.match(r"BODY(?:\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?", item, re.IGNORECASE)
+            section, offset, size = match.group(1), match.group(2), match.group(3)
+
+            if not section:
+                # BODY[] is the whole message; only the non-PEEK form sets \Seen
+                data = self.server.paths[uid].read_bytes()
+                if not item.upper().startswith("BODY.PEEK"):
+                    self.seen.add(uid)
+            elif section.upper().startswith("HEADER.FIELDS"):
+                names = re.findall(r"[\w-]+", section[len("HEADER.FIELDS"):])
+                with open(self.server.paths[uid], "rb") as f:
+                    headers = BytesParser().parse(f, headersonly=True)
+                data = "".join(
+                    f"{name}: {headers[name]}\r\n" for name in names if headers[name] is not None
+                ).encode() + b"\r\n"
+            else:
+                part = _section(self._message(uid), section)
+                data = _encoded_payload(part) if part is not None else b""
+
+            key = f"BODY[{section}]"
+            if offset is not None:
+                data = data[int(offset):int(offset) + int(size)]
+                key += f"<{offset}>"
+
+            chunks.append(f" {key} {{{len(data)}}}\r\n".encode() + data)
+
+        chunks.append(b")\r\n")
+        self._send(b"".join(chunks))
+
+
+class LocalIMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, corpus_dir, host="127.0.0.1", port=0):
+        self.paths = {
+            uid: path
+            for uid, path in enumerate(sorted(Path(corpus_dir).glob("*.eml")), start=1)
+        }
+        self.uids = sorted(self.paths)
+        self.seen = set()
+        super().__init__((host, port), _IMAPHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def _serve(corpus_dir, port_queue):
+    server = LocalIMAPServer(corpus_dir)
+    port_queue.put(server.port)
+    server.serve_forever()
+
+
+def start_server_process(corpus_dir):
+    """
+    Run the stand-in in a child process so its memory and CPU do not
+    show up in the measurements of the reader. Returns (process, port).
+    """
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(str(corpus_dir), port_queue), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=30)
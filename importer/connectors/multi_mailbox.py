@@ -0,0 +1,230 @@
+"""
+Concurrent ingestion across every registered mailbox.
+
+Flow:
+1. Build one job per (account, folder) from MailboxAccount
+   (falls back to the EMAIL_* environment account)
+2. Run jobs on a thread pool, each borrowing a connection from a
+   bounded IMAP connection pool
+3. Each job runs the checkpoint sync for its folder
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import connection
+from config.logger import logger
+
+from importer.models import MailboxAccount
+from importer.connectors import email_reader
+
+
+MAX_CONNECTIONS = int(os.getenv("EMAIL_MAX_CONNECTIONS", 8))
+MAX_CONNECTIONS_PER_ACCOUNT = int(os.getenv("EMAIL_MAX_CONNECTIONS_PER_ACCOUNT", 2))
+
+
+# ------------------------------------------------------------------
+# CONNECTION POOL
+# ------------------------------------------------------------------
+
+class IMAPConnectionPool:
+    """
+    Bounded pool of authenticated IMAP connections.
+
+    Caps both the total number of open connections and the number per
+    account (servers reject too many concurrent logins). Released
+    connections are kept open so the next folder of the same account
+    skips the login round trips.
+    """
+
+    def __init__(self, max_total=MAX_CONNECTIONS, max_per_account=MAX_CONNECTIONS_PER_ACCOUNT):
+        self.max_total = max(1, max_total)
+        self.max_per_account = max(1, max_per_account)
+        self._cond = threading.Condition()
+        self._idle = {}
+        self._open = {}
+        self._total = 0
+
+    def acquire(self, account):
+        name = account["name"]
+        evicted = None
+
+        with self._cond:
+            while True:
+                idle = self._idle.get(name)
+                if idle:
+                    return idle.pop()
+
+                if self._open.get(name, 0) < self.max_per_account:
+                    if self._total < self.max_total:
+                        break
+
+                    # Pool is full: close an idle connection of another account
+                    evicted = self._pop_idle_other(name)
+                    if evicted:
+                        break
+
+                self._cond.wait()
+
+            self._open[name] = self._open.get(name, 0) + 1
+            self._total += 1
+
+        if evicted:
+            self._logout(evicted)
+
+        try:
+            return email_reader.connect(account)
+        except Exception:
+            self._forget(name)
+            raise
+
+    def release(self, account, mail, broken=False):
+        name = account["name"]
+        if broken:
+            self._logout(mail)
+            self._forget(name)
+            return
+
+        with self._cond:
+            self._idle.setdefault(name, []).append(mail)
+            self._cond.notify_all()
+
+    def close_all(self):
+        with self._cond:
+            idle = [m for conns in self._idle.values() for m in conns]
+            self._idle.clear()
+            self._open.clear()
+            self._total = 0
+            self._cond.notify_all()
+
+        for mail in idle:
+            self._logout(mail)
+
+    def _pop_idle_other(self, name):
+        for other, conns in self._idle.items():
+            if other != name and conns:
+                self._open[other] -= 1
+                self._total -= 1
+                return conns.pop()
+        return None
+
+    def _forget(self, name):
+        with self._cond:
+            self._open[name] -= 1
+            self._total -= 1
+            self._cond.notify_all()
+
+    @staticmethod
+    def _logout(mail):
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+
+# ------------------------------------------------------------------
+# REGISTRY
+# ------------------------------------------------------------------
+
+def get_accounts() -> list:
+    """
+    Active registry accounts, or the environment account when the
+    registry is empty.
+    """
+    accounts = [a.as_config() for a in MailboxAccount.objects.filter(is_active=True)]
+
+    if not accounts and email_reader.IMAP_HOST:
+        accounts = [email_reader.default_account()]
+
+    return accounts
+
+
+# ------------------------------------------------------------------
+# CONCURRENT FETCH
+# ------------------------------------------------------------------
+
+def _sync_job(pool, account, mailbox, batch_size, on_stored=None):
+    started = time.monotonic()
+    mail = None
+    broken = False
+
+    try:
+        mail = pool.acquire(account)
+        stats = email_reader.sync_mailbox(
+            mail, account["user"], mailbox, batch_size, on_stored=on_stored
+        )
+    except Exception as e:
+        # Connection state is unknown after a failure, never reuse it
+        broken = True
+        logger.error(f"Mailbox {account['name']}/{mailbox} failed: {e}")
+        stats = {"messages": 0, "failed": 0, "skipped": 0, "error": str(e)}
+    finally:
+        if mail is not None:
+            pool.release(account, mail, broken=broken)
+        # Each worker thread owns its own DB connection
+        connection.close()
+
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+def fetch_all_mailboxes(batch_size=None, max_connections=None, on_stored=None):
+    """
+    Sync every registered mailbox concurrently.
+
+    Wall time tracks the slowest mailbox instead of the sum, while the
+    pool keeps the number of open IMAP connections bounded.
+    `on_stored(path)` receives every saved attachment as it lands.
+    """
+    started = time.monotonic()
+    totals = {"messages": 0, "failed": 0, "skipped": 0, "mailboxes": {}}
+
+    jobs = [
+        (account, mailbox)
+        for account in get_accounts()
+        for mailbox in account["mailboxes"]
+    ]
+    if not jobs:
+        logger.warning("No mailboxes configured")
+        totals.update(seconds=0.0, rate=0.0)
+        return totals
+
+    pool = IMAPConnectionPool(max_total=max_connections or MAX_CONNECTIONS)
+    workers = min(pool.max_total, len(jobs))
+    logger.info(f"Fetching {len(jobs)} mailboxes with {workers} workers")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="imap") as executor:
+            futures = {
+                executor.submit(
+                    _sync_job, pool, account, mailbox, batch_size, on_stored
+                ): (account, mailbox)
+                for account, mailbox in jobs
+            }
+
+            for future in as_completed(futures):
+                account, mailbox = futures[future]
+                stats = future.result()
+
+                totals["messages"] += stats["messages"]
+                totals["failed"] += stats["failed"]
+                totals["skipped"] += stats["skipped"]
+                totals["mailboxes"][f"{account['name']}/{mailbox}"] = stats
+
+                logger.info(
+                    f"Mailbox {account['name']}/{mailbox}: {stats['messages']} "
+                    f"messages in {stats['seconds']:.1f}s"
+                )
+    finally:
+        pool.close_all()
+
+    totals["seconds"] = time.monotonic() - started
+    totals["rate"] = totals["messages"] / totals["seconds"] if totals["seconds"] > 0 else 0.0
+
+    logger.info(
+        f"All mailboxes fetched: {totals['messages']} messages in "
+        f"{totals['seconds']:.1f}s ({totals['rate']:.1f} msg/s)."
+    )
+    return totals
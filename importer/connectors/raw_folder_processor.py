@@ -1,49 +1,343 @@
 """
 Scan media/raw_files for unprocessed files,
 push them into Django extraction pipeline,
-then move them to media/processed.
+then archive them under media/processed/YYYY/MM/DD/<hash>/.
+
+Files whose SHA-256 was already extracted are linked to the
+earlier RawFile instead of being parsed again.
+
+With workers > 1 every file runs as its own task in a process pool,
+so a slow OCR job or a crashing parser only holds up its own file.
+
+Each file is claimed through a FileLease first, so overlapping runs
+and other hosts sharing the folder never process the same file twice.
+Progress is journaled per stage; a restart resumes each file from its
+last completed stage. Work is ordered by raw_scheduler: cheap files
+first, in their own lane.
 """
 
-import shutil
+import os
+import time
+import queue
+import signal
+import multiprocessing
+from collections import deque
 from pathlib import Path
 
+import django
 from django.conf import settings
-from importer.models import RawFile
-from importer.services.process_file import process_file
+from django.db import connections, transaction
+from importer.models import RawFile, ExtractionLog
+from importer.services.process_file import (
+    parse_raw_file,
+    save_extracted_payload,
+    should_stream,
+    stream_raw_file,
+    make_json_safe,
+)
+from importer.services.content_store import sha256_file
+from importer.services import content_store, file_lease, ingestion_journal, raw_scheduler
 from config.logger import logger
 
 
-def process_raw_folder():
-    raw_dir = Path(settings.MEDIA_ROOT) / "raw_files"
-    processed_dir = Path(settings.MEDIA_ROOT) / "processed"
+# Seconds a single file may take in a pool worker before it is abandoned
+FILE_TIMEOUT = int(os.getenv("RAW_FILE_TIMEOUT", 900))
+
+
+def _has_extraction(raw_obj):
+    raw_json = raw_obj.raw_json or {}
+    if raw_json.get("rows") or raw_json.get("raw_text") or raw_json.get("row_count"):
+        return True
+    return raw_obj.extracted_records.exists()
+
 
+def _find_extracted_original(sha256):
+    """
+    Earliest RawFile with this content whose extraction succeeded.
+    A failed or empty extraction is never reused, so the next copy
+    of the file is parsed again instead of inheriting the failure.
+    """
+    candidates = (
+        RawFile.objects
+        .filter(sha256=sha256, duplicate_of__isnull=True, raw_json__isnull=False)
+        .exclude(logs__level="ERROR")
+        .order_by("id")
+    )
+    for candidate in candidates:
+        if _has_extraction(candidate):
+            return candidate
+    return None
+
+
+def _raw_dir():
+    raw_dir = Path(settings.MEDIA_ROOT) / "raw_files"
     raw_dir.mkdir(parents=True, exist_ok=True)
-    processed_dir.mkdir(parents=True, exist_ok=True)
+    return raw_dir
+
+
+def _scan_raw_dir(raw_dir):
+    # scandir's cached d_type avoids one stat per entry
+    with os.scandir(raw_dir) as entries:
+        return [
+            Path(entry.path) for entry in entries
+            if not entry.name.startswith(".") and entry.is_file()
+        ]
 
-    logger.info(f"Scanning raw folder: {raw_dir}")
 
-    for file_path in raw_dir.iterdir():
+def process_raw_path(file_path):
+    """
+    Extract one file from media/raw_files and move it into its
+    processed/YYYY/MM/DD/<hash> archive shard.
+    Returns "ok", "failed", or "skipped" (gone, or leased by another worker).
+    """
+    file_path = Path(file_path)
+    lease_path = f"raw_files/{file_path.name}"
+
+    # Skip hidden files and writes still in progress (.incoming_*)
+    if not file_path.is_file() or file_path.name.startswith("."):
+        return "skipped"
+
+    try:
+        claimed = file_lease.claim(lease_path)
+    except Exception as e:
+        logger.exception(f"Could not claim lease for {file_path.name}: {e}")
+        return "failed"
+
+    if not claimed:
+        logger.info(f"Raw file {file_path.name} is leased by another worker, skipping")
+        return "skipped"
+
+    heartbeat = file_lease.Heartbeat(lease_path).start()
+    try:
+        # Another worker may have finished it between our scan and claim
         if not file_path.is_file():
-            continue
+            return "skipped"
 
         logger.info(f"Processing raw file: {file_path.name}")
 
-        try:
-            # 1️⃣ Create RawFile entry
-            raw_obj = RawFile.objects.create(
-                raw_file=f"raw_files/{file_path.name}"
-            )
+        sha256 = sha256_file(file_path)
+        entry = ingestion_journal.open_entry(lease_path, sha256)
+        if entry.state != "discovered":
+            logger.info(f"Resuming {file_path.name} after stage '{entry.state}'")
+
+        # 1️⃣ Create RawFile entry
+        if entry.state == "discovered":
+            # One commit: a crash here must not leave a RawFile the journal never saw
+            with transaction.atomic():
+                original = _find_extracted_original(sha256)
+
+                raw_obj = RawFile.objects.create(
+                    raw_file=lease_path,
+                    sha256=sha256,
+                    duplicate_of=original,
+                    raw_json=original.raw_json if original else None,
+                )
+
+                if original:
+                    # Identical file already extracted: nothing to parse or persist
+                    ExtractionLog.objects.create(
+                        raw_file=raw_obj,
+                        level="INFO",
+                        message="Duplicate content, extraction reused",
+                        context={"duplicate_of": original.id, "sha256": sha256},
+                    )
+                    logger.info(f"Duplicate of RawFile {original.id}, skipped parsing")
+                    ingestion_journal.advance(entry, "persisted", raw_file=raw_obj)
+                else:
+                    ingestion_journal.advance(entry, "claimed", raw_file=raw_obj)
+
+        raw_obj = entry.raw_file
+
+        # 2️⃣ Parse (the expensive stage; journaled so it never reruns).
+        # Large files are parsed and persisted in one streamed pass
+        # instead; nothing is journaled mid-stream, so a crash re-streams
+        if entry.state == "claimed" and should_stream(raw_obj):
+            file_lease.ensure(lease_path)
+            if stream_raw_file(raw_obj):
+                ingestion_journal.advance(entry, "persisted")
+            else:
+                ingestion_journal.advance(entry, "persisted", error="Extraction failed")
+
+        elif entry.state == "claimed":
+            payload = parse_raw_file(raw_obj)
+            if payload is None:
+                # Failure is logged on the RawFile; archive like before
+                ingestion_journal.advance(entry, "persisted", error="Extraction failed")
+            else:
+                ingestion_journal.advance(entry, "parsed", payload=make_json_safe(payload))
+
+        # 3️⃣ Persist rows (re-run safe: old rows for the RawFile are replaced)
+        if entry.state == "parsed":
+            file_lease.ensure(lease_path)
+            save_extracted_payload(raw_obj, entry.payload)
+            ingestion_journal.advance(entry, "persisted", payload=None)
+
+        # 4️⃣ Archive into the dated shard; RawFile now points there
+        file_lease.ensure(lease_path)
+        archived = content_store.archive_file(file_path, sha256, entry.created_at)
+        raw_obj.raw_file.name = archived
+        raw_obj.save(update_fields=["raw_file", "file_name", "file_type"])
+        ingestion_journal.advance(entry, "archived")
+
+        logger.info(f"Moved file to processed: {archived}")
+        return "ok"
 
-            # 2️⃣ Run extraction
-            process_file(raw_obj)
+    except file_lease.LeaseLost as e:
+        # The new holder finishes the file from the journal
+        logger.warning(f"{e}; abandoning {file_path.name}")
+        return "skipped"
 
-            # 3️⃣ Move processed file
-            dest_path = processed_dir / file_path.name
-            shutil.move(str(file_path), dest_path)
+    except Exception as e:
+        logger.exception(f"Error processing file {file_path}: {e}")
+        return "failed"
+
+    finally:
+        heartbeat.stop()
+        file_lease.release(lease_path)
+
+
+def _timed_process(file_path):
+    started = time.monotonic()
+    status = process_raw_path(file_path)
+    return {
+        "file": Path(file_path).name,
+        "status": status,
+        "seconds": time.monotonic() - started,
+    }
+
+
+def _init_worker():
+    # Ctrl+C and shutdown are handled by the parent, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Fresh DB connections per process; never share the parent's socket
+    django.setup()
+    connections.close_all()
+
+
+def _new_lane_pool(size):
+    # Forked children must not inherit open DB connections
+    connections.close_all()
+    # maxtasksperchild=1: a leaking or crashed parser never poisons the next file
+    return multiprocessing.Pool(size, initializer=_init_worker, maxtasksperchild=1)
+
+
+def _process_in_pool(planned, workers, timeout):
+    """
+    One pool per lane, so cheap files never queue behind OCR jobs.
+
+    A lane's pool only ever holds as many files as it has workers; the
+    rest wait here. Every submitted file is therefore running and its
+    timeout measures its own run time, not its time in the queue. A file
+    that overruns gets its lane's pool terminated at once, and the other
+    files that pool was running are resubmitted to a fresh one (the
+    journal resumes them from their last stage).
+    """
+    sizes = raw_scheduler.lane_workers(workers, planned)
+    pools = {lane: _new_lane_pool(size) for lane, size in sizes.items()}
+
+    backlog = {lane: deque() for lane in sizes}
+    for item in planned:
+        backlog[item["lane"]].append(item)
+
+    running = {lane: {} for lane in sizes}  # path → (item, result, started)
+    results = {}
+
+    # Any finished task wakes the loop; callbacks run on the pool's result thread
+    wake = queue.SimpleQueue()
+
+    def notify(_):
+        wake.put(None)
+
+    try:
+        while any(backlog.values()) or any(running.values()):
+            # 1️⃣ Top every lane up to its worker count
+            for lane, size in sizes.items():
+                while backlog[lane] and len(running[lane]) < size:
+                    item = backlog[lane].popleft()
+                    result = pools[lane].apply_async(
+                        _timed_process,
+                        (str(item["path"]),),
+                        callback=notify,
+                        error_callback=notify,
+                    )
+                    running[lane][item["path"]] = (item, result, time.monotonic())
+
+            # 2️⃣ Sleep until a task finishes or the oldest one runs out of time
+            oldest = min(started for tasks in running.values() for _, _, started in tasks.values())
+            try:
+                wake.get(timeout=max(0.0, oldest + timeout - time.monotonic()) + 0.05)
+            except queue.Empty:
+                pass
+
+            # 3️⃣ Collect finished files, recycle lanes with an overrunning one
+            now = time.monotonic()
+            for lane, tasks in running.items():
+                expired = False
+
+                for path, (item, result, started) in list(tasks.items()):
+                    if result.ready():
+                        del tasks[path]
+                        try:
+                            results[path] = {**result.get(), "lane": lane}
+                        except Exception as e:
+                            logger.error(f"Raw file {path.name} crashed its worker: {e}")
+                            results[path] = {
+                                "file": path.name,
+                                "status": "crashed",
+                                "seconds": now - started,
+                                "lane": lane,
+                            }
+                    elif now - started > timeout:
+                        del tasks[path]
+                        expired = True
+                        logger.error(f"Raw file {path.name} gave no result within {timeout}s")
+                        results[path] = {
+                            "file": path.name,
+                            "status": "timeout",
+                            "seconds": now - started,
+                            "lane": lane,
+                        }
+
+                if expired:
+                    logger.error(f"Restarting the {lane}-lane pool ({len(tasks)} files resubmitted)")
+                    pools[lane].terminate()
+                    pools[lane].join()
+                    pools[lane] = _new_lane_pool(sizes[lane])
+                    # Killed alongside the hung file: run them again first
+                    backlog[lane].extendleft(reversed([item for item, _, _ in tasks.values()]))
+                    tasks.clear()
+
+    finally:
+        # Kills anything still running (e.g. on Ctrl+C)
+        for pool in pools.values():
+            pool.terminate()
+            pool.join()
+
+    return [results[item["path"]] for item in planned]
+
+
+def process_raw_folder(workers=1, timeout=None):
+    """
+    Returns one {"file", "status", "seconds", "lane"} dict per file seen,
+    in scheduling order (see raw_scheduler).
+    """
+    raw_dir = _raw_dir()
+    ingestion_journal.recover()
+
+    logger.info(f"Scanning raw folder: {raw_dir}")
 
-            logger.info(f"Moved file to processed: {dest_path}")
+    planned = raw_scheduler.plan(_scan_raw_dir(raw_dir))
 
-        except Exception as e:
-            logger.exception(f"Error processing file {file_path}: {e}")
+    if workers and workers > 1 and len(planned) > 1:
+        logger.info(f"Processing {len(planned)} raw files with {workers} workers")
+        results = _process_in_pool(planned, workers, timeout or FILE_TIMEOUT)
+    else:
+        results = [
+            {**_timed_process(item["path"]), "lane": item["lane"]}
+            for item in planned
+        ]
 
     logger.info("Raw folder processing complete.")
+    return results
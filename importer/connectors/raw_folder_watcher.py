@@ -0,0 +1,300 @@
+"""
+Continuous watch mode for media/raw_files (long-running).
+
+Flow:
+1. Queue every file already in the folder
+2. Wait for inotify CLOSE_WRITE / MOVED_TO events (polling elsewhere)
+3. Hold each file until its size has stopped changing
+4. Order settled files with raw_scheduler and hand them to warm
+   per-lane process pools that stay up between files
+"""
+
+import os
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import multiprocessing
+from collections import deque
+
+from django.db import connections
+from config.logger import logger
+
+from importer.services import ingestion_journal, raw_scheduler
+from importer.connectors.raw_folder_processor import (
+    _raw_dir,
+    _scan_raw_dir,
+    _init_worker,
+    _timed_process,
+    FILE_TIMEOUT,
+)
+
+
+# Seconds a file's size must stay unchanged before it is processed
+SETTLE_SECONDS = float(os.getenv("RAW_WATCH_SETTLE_SECONDS", 2))
+
+# Folder rescan interval when inotify is unavailable
+POLL_INTERVAL = float(os.getenv("RAW_WATCH_POLL_INTERVAL", 5))
+
+# Recycle a pool worker after this many files (bounds parser leaks)
+MAX_TASKS_PER_CHILD = int(os.getenv("RAW_WATCH_MAX_TASKS_PER_CHILD", 50))
+
+# Loop tick while settled files wait for a free worker
+_BACKLOG_TICK = 0.2
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+# ------------------------------------------------------------------
+# INOTIFY
+# ------------------------------------------------------------------
+
+class _Inotify:
+    """
+    Minimal libc inotify binding: one directory, file names out.
+    """
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        wd = libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(str(directory)),
+            _IN_CLOSE_WRITE | _IN_MOVED_TO,
+        )
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _open_inotify(directory):
+    try:
+        return _Inotify(directory)
+    except (OSError, AttributeError) as e:
+        logger.warning(f"inotify unavailable ({e}); polling every {POLL_INTERVAL}s")
+        return None
+
+
+# ------------------------------------------------------------------
+# WATCH LOOP
+# ------------------------------------------------------------------
+
+def _new_pool(workers):
+    # Forked children must not inherit open DB connections
+    connections.close_all()
+    return multiprocessing.Pool(
+        workers,
+        initializer=_init_worker,
+        maxtasksperchild=MAX_TASKS_PER_CHILD,
+    )
+
+
+def _new_lanes(workers):
+    """
+    lane → (pool, size). A single worker serves both lanes.
+    """
+    if workers < 2:
+        pool = _new_pool(1)
+        return {"fast": (pool, 1), "slow": (pool, 1)}
+
+    sizes = raw_scheduler.lane_workers(workers, [{"lane": "fast"}, {"lane": "slow"}])
+    return {lane: (_new_pool(size), size) for lane, size in sizes.items()}
+
+
+def _close_lanes(lanes):
+    for pool in {pool for pool, _ in lanes.values()}:
+        pool.terminate()
+        pool.join()
+
+
+def watch_raw_folder(workers=1, settle_seconds=None, on_processed=None):
+    """
+    Run until interrupted, extracting files as they land in raw_files.
+
+    `on_processed(result)` receives the {"file", "status", "seconds"}
+    dict of every finished file.
+    """
+    settle_seconds = SETTLE_SECONDS if settle_seconds is None else settle_seconds
+    workers = max(1, workers or 1)
+    raw_dir = _raw_dir()
+    ingestion_journal.recover()
+
+    watcher = _open_inotify(raw_dir)
+    lanes = _new_lanes(workers)
+    results = queue.Queue()
+
+    settling = {}   # path → (size, mtime, stable since)
+    backlog = {lane: deque() for lane in lanes}  # settled, waiting for a free worker
+    in_flight = {}  # path → (started at, lane); never more than a pool's workers
+    handled = {}    # path → (size, mtime) already submitted
+
+    def running_in(pool):
+        return [p for p, (_, lane) in in_flight.items() if lanes[lane][0] is pool]
+
+    def report(result):
+        logger.info(f"Watch: {result['file']} {result['status']} in {result['seconds']:.2f}s")
+        if on_processed:
+            on_processed(result)
+
+    def collect_finished():
+        while not results.empty():
+            result = results.get()
+            path = raw_dir / result["file"]
+            in_flight.pop(path, None)
+            if result["status"] == "ok":
+                # Moved to processed; a new file with this name is new work
+                handled.pop(path, None)
+            report(result)
+
+    def track(path):
+        if path.name.startswith(".") or path in in_flight:
+            return
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return
+        if handled.get(path) == (stat.st_size, stat.st_mtime):
+            return
+        settling.setdefault(path, (stat.st_size, stat.st_mtime, time.monotonic()))
+
+    logger.info(f"Watching {raw_dir} with {workers} warm workers")
+
+    for path in _scan_raw_dir(raw_dir):
+        track(path)
+
+    last_scan = time.monotonic()
+
+    try:
+        while True:
+            # 1️⃣ Collect new names (or rescan when polling). A backlog
+            # waits on results, so tick faster than the folder needs
+            busy = settling or in_flight
+            wait = settle_seconds if busy else POLL_INTERVAL
+            tick = min(wait, _BACKLOG_TICK) if any(backlog.values()) else wait
+            if watcher:
+                for name in watcher.read(tick):
+                    track(raw_dir / name)
+            else:
+                time.sleep(min(tick, POLL_INTERVAL))
+                if time.monotonic() - last_scan >= min(wait, POLL_INTERVAL):
+                    last_scan = time.monotonic()
+                    for path in _scan_raw_dir(raw_dir):
+                        track(path)
+
+            # 2️⃣ Queue files whose size has settled, cheapest/most urgent first
+            now = time.monotonic()
+            ready = []
+            for path, (size, mtime, since) in list(settling.items()):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    del settling[path]
+                    continue
+
+                if (stat.st_size, stat.st_mtime) != (size, mtime):
+                    settling[path] = (stat.st_size, stat.st_mtime, now)
+                    continue
+                if now - since < settle_seconds:
+                    continue
+
+                del settling[path]
+                handled[path] = (size, mtime)
+                ready.append(path)
+
+            # Most ticks have nothing new; planning looks up email senders
+            if ready:
+                for item in raw_scheduler.plan(ready):
+                    backlog[item["lane"]].append(item["path"])
+
+            # 3️⃣ Report finished files
+            collect_finished()
+
+            # 4️⃣ Pools only get as many files as they have workers, so
+            # every submitted file is running and in_flight times its run
+            for lane, (pool, size) in lanes.items():
+                while backlog[lane] and len(running_in(pool)) < size:
+                    path = backlog[lane].popleft()
+                    in_flight[path] = (time.monotonic(), lane)
+                    pool.apply_async(
+                        _timed_process,
+                        (str(path),),
+                        callback=results.put,
+                        error_callback=lambda e, p=path: results.put(
+                            {"file": p.name, "status": "crashed", "seconds": 0.0, "error": str(e)}
+                        ),
+                    )
+
+            # 5️⃣ A file over FILE_TIMEOUT gets its pool replaced; the other
+            # files that pool was running go back to the front of their lane
+            now = time.monotonic()
+            for pool, size in {pool: size for pool, size in lanes.values()}.items():
+                stuck = [p for p in running_in(pool) if now - in_flight[p][0] > FILE_TIMEOUT]
+                if not stuck:
+                    continue
+
+                logger.error(
+                    f"Watch: {', '.join(p.name for p in stuck)} exceeded {FILE_TIMEOUT}s, "
+                    f"restarting its pool"
+                )
+                pool.terminate()
+                pool.join()
+
+                # Files that finished just before the kill are not rerun
+                collect_finished()
+                held = running_in(pool)
+
+                fresh = _new_pool(size)
+                # A shared single-worker pool serves both lanes
+                for name, (other, other_size) in lanes.items():
+                    if other is pool:
+                        lanes[name] = (fresh, other_size)
+
+                for path in reversed(held):
+                    started, lane = in_flight.pop(path)
+                    if path in stuck:
+                        # Stays in handled: retried only once the file changes
+                        report({"file": path.name, "status": "timeout", "seconds": now - started})
+                    else:
+                        backlog[lane].appendleft(path)
+
+    except KeyboardInterrupt:
+        logger.info("Raw folder watcher stopped.")
+
+    finally:
+        _close_lanes(lanes)
+        if watcher:
+            watcher.close()
@@ -0,0 +1,146 @@
+"""
+Single-pass HTML email body extractor.
+
+Parses the HTML once with lxml and returns both the readable text and
+every data table (colspan/rowspan expanded, layout tables dropped).
+"""
+
+import re
+
+import lxml.html
+import pandas as pd
+from lxml import etree
+
+from config.logger import logger
+
+
+_BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "table", "h1", "h2", "h3",
+    "h4", "h5", "h6", "blockquote", "pre", "hr",
+}
+_DROP_TAGS = ("script", "style", "head", "title")
+_SPACES_RE = re.compile(r"[ \t\u00a0]+")
+
+
+def _cell_text(cell) -> str:
+    return " ".join(cell.text_content().split())
+
+
+def _own_rows(table):
+    # Rows of this table only, never of a table nested inside a cell
+    return table.xpath("./tr | ./thead/tr | ./tbody/tr | ./tfoot/tr")
+
+
+def _span(cell, attr) -> int:
+    try:
+        return max(1, min(int(cell.get(attr, 1)), 1000))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _table_grid(table) -> list:
+    """
+    Expand a <table> into a rectangular list of rows,
+    repeating colspan/rowspan cell text into every covered slot.
+    """
+    grid = []
+    pending = {}  # column → [rows_left, text]
+
+    for tr in _own_rows(table):
+        row = []
+        col = 0
+        cells = tr.xpath("./td | ./th")
+        idx = 0
+
+        while idx < len(cells) or any(c >= col for c in pending):
+            if col in pending:
+                rows_left, text = pending[col]
+                row.append(text)
+                if rows_left <= 1:
+                    del pending[col]
+                else:
+                    pending[col][0] = rows_left - 1
+                col += 1
+                continue
+
+            if idx >= len(cells):
+                # Short row ahead of a rowspan further right
+                row.append("")
+                col += 1
+                continue
+
+            cell = cells[idx]
+            idx += 1
+            text = _cell_text(cell)
+            colspan = _span(cell, "colspan")
+            rowspan = _span(cell, "rowspan")
+
+            for _ in range(colspan):
+                row.append(text)
+                if rowspan > 1:
+                    pending[col] = [rowspan - 1, text]
+                col += 1
+
+        if any(v for v in row):
+            grid.append(row)
+
+    width = max((len(r) for r in grid), default=0)
+    return [r + [""] * (width - len(r)) for r in grid]
+
+
+def _is_layout_table(table, grid) -> bool:
+    if (table.get("role") or "").lower() == "presentation":
+        return True
+    # Tables that wrap other tables are page layout, not data
+    if table.xpath(".//table"):
+        return True
+    if len(grid) < 2 or len(grid[0]) < 2:
+        return True
+    return False
+
+
+def _body_text(root) -> str:
+    for el in root.iter():
+        if not isinstance(el.tag, str):
+            continue
+        tag = el.tag.lower()
+        if tag in _BLOCK_TAGS:
+            el.tail = "\n" + (el.tail or "")
+        elif tag in ("td", "th"):
+            el.tail = " " + (el.tail or "")
+
+    lines = (
+        _SPACES_RE.sub(" ", line).strip()
+        for line in root.text_content().splitlines()
+    )
+    return "\n".join(line for line in lines if line)
+
+
+def extract_html_body(html_text: str) -> dict:
+    """
+    Returns {"text": str, "tables": [DataFrame, ...]}.
+    The first row of each data table becomes its header.
+    """
+    result = {"text": "", "tables": []}
+    if not html_text or not html_text.strip():
+        return result
+
+    try:
+        root = lxml.html.fromstring(html_text)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"HTML body could not be parsed: {e}")
+        return result
+
+    for el in root.xpath("|".join(f"//{tag}" for tag in _DROP_TAGS)):
+        if el.getparent() is not None:
+            el.drop_tree()
+
+    for table in root.iter("table"):
+        grid = _table_grid(table)
+        if _is_layout_table(table, grid):
+            continue
+
+        result["tables"].append(pd.DataFrame(grid[1:], columns=grid[0]))
+
+    result["text"] = _body_text(root)
+    return result
@@ -0,0 +1,111 @@
+"""
+Importer registry for UnifiedImporter.
+
+Each importer is described by its extensions and file signatures and
+is only imported the first time a file needs it, so a worker that
+only sees spreadsheets never loads pdfplumber / pytesseract / camelot.
+Files are matched on their leading bytes first, so a PDF saved as
+.xlsx or an .xlsx saved as .xls still reaches the right parser.
+"""
+
+import zipfile
+import importlib
+from pathlib import Path
+
+from config.logger import logger
+
+
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = b"PK\x03\x04"
+PDF_MAGIC = b"%PDF"
+
+SNIFF_BYTES = 2048
+
+# OLE2 files routed to Excel by content; other OLE2 files go by extension
+_OLE2_EXCEL_EXTENSIONS = ("", ".xls", ".xlt")
+
+
+class ImporterEntry:
+    def __init__(self, name, target, extensions):
+        self.name = name
+        self.target = target            # "package.module:ClassName"
+        self.extensions = extensions
+        self._cls = None
+
+    def load(self):
+        if self._cls is None:
+            module_name, _, class_name = self.target.partition(":")
+            self._cls = getattr(importlib.import_module(module_name), class_name)
+            logger.info(f"Loaded importer {self.name} ({self.target})")
+        return self._cls
+
+
+REGISTRY = {
+    entry.name: entry
+    for entry in (
+        ImporterEntry("excel", "importer.extraction.unified.excel_importer:ExcelImporter", (".xls", ".xlsx")),
+        ImporterEntry("csv", "importer.extraction.unified.csv_importer:CSVImporter", (".csv",)),
+        ImporterEntry("text", "importer.extraction.unified.text_importer:TextImporter", (".txt",)),
+        ImporterEntry("word", "importer.extraction.unified.word_importer:WordImporter", (".docx",)),
+        ImporterEntry("pdf", "importer.extraction.unified.pdf_importer:PDFImporter", (".pdf",)),
+    )
+}
+
+_BY_EXTENSION = {
+    ext: entry.name
+    for entry in REGISTRY.values()
+    for ext in entry.extensions
+}
+
+# File types UnifiedImporter can route to an importer
+SUPPORTED_EXTENSIONS = tuple(_BY_EXTENSION)
+
+
+def _zip_kind(path):
+    # xlsx and docx share the ZIP signature; the member names tell them apart
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return None
+
+    if any(name.startswith("xl/") for name in names):
+        return "excel"
+    if any(name.startswith("word/") for name in names):
+        return "word"
+    return None
+
+
+def detect(path) -> str:
+    """
+    Name of the importer for `path`, or None if nothing can parse it.
+    Signatures win over the extension; text files go by extension.
+    """
+    path = Path(path)
+    ext = path.suffix.lower()
+
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+
+    if PDF_MAGIC in head[:1024]:
+        kind = "pdf"
+    elif head.startswith(OLE2_MAGIC) and ext in _OLE2_EXCEL_EXTENSIONS:
+        # .doc / .msg / .ppt are OLE2 too; only these can be legacy Excel
+        kind = "excel"
+    elif head.startswith(ZIP_MAGIC):
+        kind = _zip_kind(path) or _BY_EXTENSION.get(ext)
+    else:
+        kind = _BY_EXTENSION.get(ext)
+
+    if kind is None and not ext and head and b"\x00" not in head:
+        # No extension at all but plain text: delimited → csv, else text
+        first_line = head.split(b"\n", 1)[0]
+        kind = "csv" if any(d in first_line for d in (b",", b";", b"\t")) else "text"
+
+    if kind and _BY_EXTENSION.get(ext) not in (None, kind):
+        logger.info(f"{path.name}: content is {kind}, not {ext}")
+    return kind
+
+
+def load(name):
+    return REGISTRY[name].load()
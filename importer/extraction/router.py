@@ -1,13 +1,14 @@
 from pathlib import Path
 from config.logger import logger
 
-from importer.extraction.unified.excel_importer import ExcelImporter
-from importer.extraction.unified.csv_importer import CSVImporter
-from importer.extraction.unified.text_importer import TextImporter
-from importer.extraction.unified.word_importer import WordImporter
-from importer.extraction.unified.pdf_importer import PDFImporter
+from importer.extraction import registry
+from importer.extraction import sandbox
+from importer.services import parse_cache
 
 
+# File types UnifiedImporter can route to an importer
+SUPPORTED_EXTENSIONS = registry.SUPPORTED_EXTENSIONS
+
 class UnifiedImporter:
     """
     Ensures ALL importers return the SAME structure:
@@ -19,52 +20,58 @@ class UnifiedImporter:
     }
     """
 
-    def parse(self, file_path: str) -> dict:
-        ext = Path(file_path).suffix.lower()
-        logger.info(f"Routing file: {file_path} (ext={ext})")
-
+    def parse_dataframe(self, df) -> dict:
+        """
+        Route an in-memory table (e.g. an email body table) through the
+        spreadsheet normalizer without writing it to disk first.
+        """
         try:
-            if ext in (".xls", ".xlsx"):
-                return ExcelImporter().parse(file_path)
-
-            if ext == ".csv":
-                return CSVImporter().parse(file_path)
+            # Blank cells read back from .xlsx as NaN, match that
+            return registry.load("excel")().parse_dataframe(df.replace("", None))
+        except Exception:
+            logger.exception("❌ UnifiedImporter failed for in-memory table")
+            return {
+                "raw_text": "",
+                "raw_json": {},
+                "rows": [],
+            }
 
-            if ext == ".txt":
-                return TextImporter().parse(file_path)
+    def parse(self, file_path: str, sha256: str = None) -> dict:
+        """
+        `sha256` of the file enables the parse cache: an unchanged file
+        already parsed by the same importer version and settings is not
+        parsed again.
+        """
+        ext = Path(file_path).suffix.lower()
 
-            if ext == ".docx":
-                return WordImporter().parse(file_path)
+        try:
+            kind = registry.detect(file_path)
+            logger.info(f"Routing file: {file_path} (ext={ext}, importer={kind})")
 
-            if ext == ".pdf":
-                pdf_result = PDFImporter().parse(file_path)
+            if kind is None:
+                raise ValueError(f"Unsupported extension: {ext}")
 
-                # 🔥 NORMALIZE PDF OUTPUT HERE
-                if isinstance(pdf_result, dict):
-                    return pdf_result
+            importer_cls = registry.load(kind)
+            version = parse_cache.version_key(importer_cls)
 
-                if isinstance(pdf_result, list):
-                    return {
-                        "raw_text": "",
-                        "raw_json": {"pdf_rows": pdf_result},
-                        "rows": pdf_result,
-                    }
+            cached = parse_cache.get(sha256, kind, version)
+            if cached is not None:
+                logger.info(f"Parse cache hit: {file_path} ({kind} v{version})")
+                return cached
 
-                if isinstance(pdf_result, str):
-                    return {
-                        "raw_text": pdf_result,
-                        "raw_json": {"text": pdf_result},
-                        "rows": [],
-                    }
+            if sandbox.ENABLED:
+                result = self._normalize(sandbox.run(kind, file_path))
+            else:
+                result = self._normalize(importer_cls().parse(file_path))
 
-                # Fallback
-                return {
-                    "raw_text": "",
-                    "raw_json": {},
-                    "rows": [],
-                }
+            # Empty results may be transient failures; parse those again next time
+            if result.get("rows") or result.get("raw_text"):
+                parse_cache.put(sha256, kind, version, result)
+            return result
 
-            raise ValueError(f"Unsupported extension: {ext}")
+        except sandbox.ParseKilled:
+            # Callers record these as structured failures
+            raise
 
         except Exception as e:
             logger.exception(f"❌ UnifiedImporter failed for {file_path}")
@@ -73,3 +80,49 @@ class UnifiedImporter:
                 "raw_json": {},
                 "rows": [],
             }
+
+    def iter_rows(self, file_path: str, batch_size: int = 1000):
+        """
+        Streaming counterpart of parse(): yields lists of at most
+        `batch_size` normalized row dicts as the importer reads the file.
+
+        Unlike parse(), failures raise: a stream that already handed out
+        rows cannot be turned into an empty payload. Streams bypass the
+        parse cache, whose point is to avoid holding large results.
+        """
+        kind = registry.detect(file_path)
+        logger.info(f"Streaming file: {file_path} (importer={kind}, batch={batch_size})")
+
+        if kind is None:
+            raise ValueError(f"Unsupported extension: {Path(file_path).suffix.lower()}")
+
+        if sandbox.ENABLED:
+            yield from sandbox.stream(kind, file_path, batch_size)
+        else:
+            yield from registry.load(kind)().iter_rows(file_path, batch_size)
+
+    def _normalize(self, result) -> dict:
+        # 🔥 NORMALIZE PDF-STYLE OUTPUT HERE
+        if isinstance(result, dict):
+            return result
+
+        if isinstance(result, list):
+            return {
+                "raw_text": "",
+                "raw_json": {"pdf_rows": result},
+                "rows": result,
+            }
+
+        if isinstance(result, str):
+            return {
+                "raw_text": result,
+                "raw_json": {"text": result},
+                "rows": [],
+            }
+
+        # Fallback
+        return {
+            "raw_text": "",
+            "raw_json": {},
+            "rows": [],
+        }
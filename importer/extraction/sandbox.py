@@ -0,0 +1,333 @@
+"""
+Isolated parse mode for UnifiedImporter.
+
+With PARSE_SANDBOX_ENABLED the importer runs in a long-lived worker
+subprocess instead of in-process. The parent waits with a wall-clock
+timeout and watches the worker's RSS; a parse that overruns either
+limit gets its worker killed (a fresh one is started for the next
+file) and surfaces as ParseKilled so the caller can log it. A camelot
+loop or an xlsx zip bomb then costs one file, not the whole
+process_raw_folder run or the admin worker.
+
+The worker only imports the extraction package (no Django), and is
+reused across files until PARSE_SANDBOX_MAX_TASKS. Each calling thread
+gets its own worker. The worker leads its own process group, so
+processes it starts (ExcelImporter's sheet pool, tesseract) count
+toward its RSS and die with it.
+"""
+
+import os
+import sys
+import time
+import pickle
+import select
+import signal
+import struct
+import threading
+import subprocess
+import traceback
+
+from config.logger import logger
+
+
+# Run importers in a worker subprocess
+ENABLED = os.getenv("PARSE_SANDBOX_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Seconds one parse may run before its worker is killed
+TIMEOUT = float(os.getenv("PARSE_SANDBOX_TIMEOUT", 600))
+
+# Resident memory (MB) one parse may reach before its worker is killed
+MAX_RSS_MB = int(os.getenv("PARSE_SANDBOX_MAX_RSS_MB", 2048))
+
+# Hard address-space limit (MB) set on the worker; 0 = none. Catches
+# allocations too fast for the RSS watch.
+MAX_VM_MB = int(os.getenv("PARSE_SANDBOX_MAX_VM_MB", 0))
+
+# Files parsed by one worker before it is replaced (bounds parser leaks)
+MAX_TASKS = int(os.getenv("PARSE_SANDBOX_MAX_TASKS", 100))
+
+# How often the parent samples the worker's RSS
+_WATCH_INTERVAL = 0.1
+
+_FRAME = struct.Struct("!Q")
+
+
+class ParseKilled(Exception):
+    """
+    A sandboxed parse exceeded its limits or its worker died.
+    `reason` is "timeout", "memory" or "crashed".
+    """
+
+    def __init__(self, reason, path, seconds, rss_mb=None, detail=""):
+        self.reason = reason
+        self.path = str(path)
+        self.seconds = seconds
+        self.rss_mb = rss_mb
+        self.detail = detail
+        super().__init__(f"Parse {reason} after {seconds:.1f}s: {path} {detail}".strip())
+
+    def context(self) -> dict:
+        return {
+            "reason": self.reason,
+            "file": self.path,
+            "seconds": round(self.seconds, 2),
+            "rss_mb": self.rss_mb,
+            "timeout": TIMEOUT,
+            "max_rss_mb": MAX_RSS_MB,
+            "detail": self.detail,
+        }
+
+
+# ------------------------------------------------------------------
+# FRAMING
+# ------------------------------------------------------------------
+
+def _send(stream, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    frame = memoryview(_FRAME.pack(len(data)) + data)
+    # Unbuffered pipes may take a frame in several writes
+    while frame:
+        frame = frame[stream.write(frame):]
+    stream.flush()
+
+
+def _read_exact(stream, size):
+    chunks = []
+    while size:
+        chunk = stream.read(size)
+        if not chunk:
+            raise EOFError("sandbox stream closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(stream):
+    (size,) = _FRAME.unpack(_read_exact(stream, _FRAME.size))
+    return pickle.loads(_read_exact(stream, size))
+
+
+# ------------------------------------------------------------------
+# PARENT SIDE
+# ------------------------------------------------------------------
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _descendants(pid):
+    pids = [pid]
+    for parent in pids:
+        try:
+            for tid in os.listdir(f"/proc/{parent}/task"):
+                with open(f"/proc/{parent}/task/{tid}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return pids
+
+
+def _rss_mb(pid):
+    """
+    Resident memory of `pid` and every process below it, in MB.
+    """
+    sizes = [_rss_kb(p) for p in _descendants(pid)]
+    if sizes[0] is None:
+        return None
+    return sum(size for size in sizes if size) // 1024
+
+
+def _limit_address_space():
+    import resource
+
+    limit = MAX_VM_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class _Worker:
+    def __init__(self):
+        from django.conf import settings
+
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [str(settings.BASE_DIR), env.get("PYTHONPATH")])
+        )
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "importer.extraction.sandbox"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # Unbuffered: a frame read ahead into a buffer would be
+            # invisible to select() and stall the next wait
+            bufsize=0,
+            cwd=settings.BASE_DIR,
+            env=env,
+            preexec_fn=_limit_address_space if MAX_VM_MB else None,
+            # Own process group: kill() takes the worker's children too
+            start_new_session=True,
+        )
+        self.tasks = 0
+        logger.info(f"Parse sandbox worker started (pid {self.proc.pid})")
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+
+    def replies(self, kind, file_path, batch_size=None):
+        """
+        Send one request and yield its (status, value) frames until the
+        final one. Only time spent waiting on the worker counts toward
+        TIMEOUT, so a slow consumer of a stream is not penalised.
+        """
+        self.tasks += 1
+        waited = 0.0
+        peak_rss = None
+
+        try:
+            _send(self.proc.stdin, (kind, str(file_path), batch_size))
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise ParseKilled("crashed", file_path, 0.0, detail=str(e))
+
+        while True:
+            started = time.monotonic()
+            ready, _, _ = select.select([self.proc.stdout], [], [], _WATCH_INTERVAL)
+            waited += time.monotonic() - started
+
+            if ready:
+                try:
+                    status, value = _recv(self.proc.stdout)
+                except (EOFError, pickle.UnpicklingError, struct.error) as e:
+                    code = self.proc.wait()
+                    raise ParseKilled("crashed", file_path, waited, peak_rss, f"exit code {code}: {e}")
+                if status == "memory":
+                    self.kill()
+                    raise ParseKilled("memory", file_path, waited, peak_rss, value)
+
+                yield status, value
+                if status != "batch":
+                    return
+                continue
+
+            rss = _rss_mb(self.proc.pid)
+            if rss is not None:
+                peak_rss = max(peak_rss or 0, rss)
+
+            if rss is not None and rss > MAX_RSS_MB:
+                self.kill()
+                raise ParseKilled("memory", file_path, waited, rss, f"RSS {rss} MB > {MAX_RSS_MB} MB")
+
+            if waited > TIMEOUT:
+                self.kill()
+                raise ParseKilled("timeout", file_path, waited, peak_rss)
+
+            if not self.alive():
+                raise ParseKilled(
+                    "crashed", file_path, waited, peak_rss,
+                    f"exit code {self.proc.returncode}",
+                )
+
+
+# One worker per calling thread: a worker serves one request at a time
+_local = threading.local()
+
+
+def _replies(kind, file_path, batch_size=None):
+    worker = getattr(_local, "worker", None)
+    if worker is None or not worker.alive() or worker.tasks >= MAX_TASKS:
+        if worker is not None:
+            worker.kill()
+        worker = _local.worker = _Worker()
+
+    finished = False
+    try:
+        for status, value in worker.replies(kind, file_path, batch_size):
+            # The final frame leaves the worker idle and reusable
+            finished = status != "batch"
+            if status == "error":
+                raise RuntimeError(value)
+            yield status, value
+    except ParseKilled as e:
+        logger.error(f"❌ Sandbox killed parse: {e}")
+        raise
+    finally:
+        if not finished:
+            # Killed, failed, or abandoned mid-stream: frames may still be
+            # queued, so this worker cannot take the next request
+            worker.kill()
+            # An abandoned stream may be finalized on another thread
+            if getattr(_local, "worker", None) is worker:
+                _local.worker = None
+
+
+def run(kind, file_path):
+    """
+    Parse `file_path` with importer `kind` in the sandbox worker and
+    return the importer's result. Raises ParseKilled on timeout,
+    memory overrun or worker death.
+    """
+    for _, value in _replies(kind, file_path):
+        return value
+
+
+def stream(kind, file_path, batch_size):
+    """
+    Sandboxed iter_rows(): yields the importer's row batches as the
+    worker produces them. Same limits as run().
+    """
+    for status, value in _replies(kind, file_path, batch_size):
+        if status == "batch":
+            yield value
+
+
+# ------------------------------------------------------------------
+# WORKER SIDE
+# ------------------------------------------------------------------
+
+def _serve():
+    # Keep the protocol pipe private; stray prints go to stderr
+    channel = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    requests = sys.stdin.buffer
+
+    # The parent owns shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from importer.extraction import registry
+
+    while True:
+        try:
+            kind, file_path, batch_size = _recv(requests)
+        except EOFError:
+            return
+
+        try:
+            importer = registry.load(kind)()
+            if batch_size:
+                for batch in importer.iter_rows(file_path, batch_size):
+                    _send(channel, ("batch", batch))
+                reply = ("done", None)
+            else:
+                reply = ("ok", importer.parse(file_path))
+        except MemoryError:
+            reply = ("memory", f"MemoryError under the {MAX_VM_MB} MB address-space limit")
+        except Exception:
+            reply = ("error", traceback.format_exc())
+
+        _send(channel, reply)
+
+
+if __name__ == "__main__":
+    _serve()
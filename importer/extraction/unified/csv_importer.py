@@ -1,10 +1,12 @@
 # parsers/unified/csv_importer.py
 import pandas as pd
-from importer.extraction.unified.normalize import normalize_table
+from importer.extraction.unified.normalize import normalize_table, scan_chunks
 from config.logger import logger
 
 
 class CSVImporter:
+    VERSION = "2"
+
     def parse(self, path: str) -> dict:
         """
         Parse a CSV file into unified format.
@@ -13,7 +15,22 @@ class CSVImporter:
         df = pd.read_csv(path)
 
         columns = df.columns.tolist()
-        rows = df.values.tolist()
+        # Per-column values: .values alone upcasts ints when every column is numeric
+        rows = df.astype(object).values.tolist()
 
         table = normalize_table(columns, rows)
-        return {"tables": [table]}
+        return {"tables": [table], "rows": table["rows"]}
+
+    def iter_rows(self, path: str, batch_size: int = 1000):
+        """
+        Streaming counterpart of parse(): reads `batch_size` lines at a
+        time and yields each chunk's normalized rows. A first pass fixes
+        the column set and dtypes, so the batches add up to parse().
+        """
+        logger.info(f"Streaming CSV file: {path}")
+        keep, dtypes = scan_chunks(pd.read_csv(path, chunksize=batch_size))
+
+        for chunk in pd.read_csv(path, chunksize=batch_size, dtype=dtypes):
+            table = normalize_table(chunk.columns.tolist(), chunk.astype(object).values.tolist(), keep)
+            if table["rows"]:
+                yield table["rows"]
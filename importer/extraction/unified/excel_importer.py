@@ -1,46 +1,474 @@
+import os
+import itertools
+import importlib.util
 import pandas as pd
+from datetime import datetime, time
 from pathlib import Path
-import tempfile
-from openpyxl import Workbook
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
 import xlrd
 
-from importer.extraction.unified.normalize import normalize_table
+from importer.extraction.unified.normalize import (
+    normalize_table,
+    iter_batches,
+    is_empty_value,
+    safe_headers,
+)
+from importer.extraction.registry import OLE2_MAGIC
 from config.logger import logger
 
 
-def convert_xls_to_xlsx(xls_path: str) -> str:
-    book = xlrd.open_workbook(xls_path)
-    sheet = book.sheet_by_index(0)
+# Workbook reader: "auto", "openpyxl", "readonly" or "calamine".
+# auto keeps openpyxl for small files and switches large ones to
+# calamine when installed, else to openpyxl read-only streaming.
+EXCEL_READER = os.getenv("EXCEL_READER", "auto").lower()
 
-    wb = Workbook()
-    ws = wb.active
+# Size from which "auto" uses a fast reader
+EXCEL_FAST_READER_MIN_BYTES = int(os.getenv("EXCEL_FAST_READER_MIN_BYTES", 5 * 1024 * 1024))
 
-    for r in range(sheet.nrows):
-        ws.append(sheet.row_values(r))
+# Sheets to extract: comma-separated names or 0-based indexes; empty = all
+EXCEL_SHEETS = [s.strip() for s in os.getenv("EXCEL_SHEETS", "").split(",") if s.strip()]
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-    wb.save(tmp.name)
+# Processes parsing the sheets of one large workbook (capped at the CPU count)
+EXCEL_SHEET_WORKERS = int(os.getenv("EXCEL_SHEET_WORKERS", 4))
 
-    logger.info(f"Converted .xls to .xlsx: {tmp.name}")
-    return tmp.name
+# Workbooks from this size parse their sheets in separate processes;
+# smaller ones are parsed one sheet after another in-process
+EXCEL_SHEET_PROCESS_MIN_BYTES = int(os.getenv("EXCEL_SHEET_PROCESS_MIN_BYTES", 2 * 1024 * 1024))
+
+# pandas' calamine engine needs the optional python-calamine package
+_HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
 
 
 class ExcelImporter:
+    VERSION = "4"
+
+    @classmethod
+    def cache_fingerprint(cls) -> str:
+        # Settings that change the parse result (not just its speed)
+        return repr((EXCEL_READER, EXCEL_FAST_READER_MIN_BYTES, _HAS_CALAMINE, EXCEL_SHEETS))
 
     def parse(self, path: str) -> dict:
         logger.info(f"Parsing Excel file: {path}")
         file_path = Path(path)
 
         try:
-            if file_path.suffix.lower() == ".xls":
-                xlsx_path = convert_xls_to_xlsx(path)
-                df = pd.read_excel(xlsx_path, engine="openpyxl")
-            else:
-                df = pd.read_excel(path, engine="openpyxl")
+            # Go by content: .xls files are often really .xlsx, and vice versa
+            with open(file_path, "rb") as f:
+                is_legacy = f.read(8) == OLE2_MAGIC
+
+            reader = self._choose_reader(file_path)
+            sheets = self._select_sheets(self._sheet_names(path, is_legacy))
+            logger.info(f"Excel reader: {reader}, sheets: {sheets}")
         except Exception as e:
             logger.error(f"❌ Cannot read Excel: {e}")
             return {"raw_text": "", "raw_json": {}, "rows": []}
 
+        # One plant per sheet is common; sheets are independent, so on
+        # enough cores a workbook takes about as long as its biggest sheet
+        processes = min(EXCEL_SHEET_WORKERS, len(sheets), os.cpu_count() or 1)
+        if self._use_processes(file_path, processes):
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as pool:
+                parsed = list(pool.map(
+                    self._parse_sheet,
+                    [path] * len(sheets),
+                    sheets,
+                    [reader] * len(sheets),
+                    [is_legacy] * len(sheets),
+                ))
+        else:
+            parsed = self._parse_sheets(path, sheets, reader, is_legacy)
+
+        tables = []
+        rows = []
+        for sheet, result in zip(sheets, parsed):
+            if result is None:
+                continue
+            for table in result["raw_json"]["tables"]:
+                table["sheet"] = sheet
+                tables.append(table)
+            rows.extend(result["rows"])
+
+        return {
+            "raw_text": "",
+            "raw_json": {"tables": tables, "sheets": sheets},
+            "rows": rows,
+        }
+
+    @staticmethod
+    def _use_processes(file_path: Path, processes) -> bool:
+        # Daemonic pool workers (process_raw_folder --workers) cannot
+        # have child processes
+        return (
+            processes > 1
+            and file_path.stat().st_size >= EXCEL_SHEET_PROCESS_MIN_BYTES
+            and not multiprocessing.current_process().daemon
+        )
+
+    def _parse_sheets(self, source, sheets, reader, is_legacy):
+        """
+        Every sheet in this process, one after another: sheet parsing is
+        GIL-bound, so threads only added contention. pandas readers get
+        all sheets from a single read_excel call.
+        """
+        engine = "calamine" if reader == "calamine" else "openpyxl"
+        if len(sheets) > 1 and (reader == "calamine" or (reader == "openpyxl" and not is_legacy)):
+            try:
+                frames = pd.read_excel(source, engine=engine, sheet_name=sheets)
+            except Exception as e:
+                # Per-sheet reads, so one bad sheet loses only itself
+                logger.warning(f"Reading all sheets at once failed ({e}); reading them one by one")
+            else:
+                return [self.parse_dataframe(frames[sheet]) for sheet in sheets]
+
+        return [self._parse_sheet(source, sheet, reader, is_legacy) for sheet in sheets]
+
+    def _parse_sheet(self, source, sheet, reader, is_legacy):
+        """
+        Read + normalize one sheet. Returns None (logged) if the sheet
+        cannot be read, so one bad sheet does not lose the others.
+        """
+        try:
+            if reader == "calamine":
+                df = pd.read_excel(source, engine="calamine", sheet_name=sheet)
+            elif reader == "readonly" or is_legacy:
+                # .xls is built straight from xlrd values; no .xlsx round trip
+                df = self._values_dataframe(self._sheet_values(source, is_legacy, sheet))
+            else:
+                df = pd.read_excel(source, engine="openpyxl", sheet_name=sheet)
+        except Exception as e:
+            logger.error(f"❌ Cannot read Excel sheet {sheet!r}: {e}")
+            return None
+
+        return self.parse_dataframe(df)
+
+    @staticmethod
+    def _sheet_names(path, is_legacy) -> list:
+        if is_legacy:
+            return xlrd.open_workbook(path, on_demand=True).sheet_names()
+
+        with open(path, "rb") as f:
+            wb = load_workbook(f, read_only=True)
+            try:
+                return list(wb.sheetnames)
+            finally:
+                wb.close()
+
+    @staticmethod
+    def _select_sheets(names) -> list:
+        """
+        EXCEL_SHEETS applied to the workbook's sheet names (all when unset).
+        """
+        if not EXCEL_SHEETS:
+            return names
+
+        by_name = {name.lower(): name for name in names}
+        selected = []
+        for wanted in EXCEL_SHEETS:
+            if wanted.lower() in by_name:
+                name = by_name[wanted.lower()]
+            elif wanted.isdigit() and int(wanted) < len(names):
+                name = names[int(wanted)]
+            else:
+                continue
+            if name not in selected:
+                selected.append(name)
+
+        if not selected:
+            logger.warning(f"No sheet matches EXCEL_SHEETS={EXCEL_SHEETS}; using all of {names}")
+            return names
+        return selected
+
+    def iter_rows(self, path: str, batch_size: int = 1000):
+        """
+        Streaming counterpart of parse(): walks the selected sheets one
+        after another, row by row (openpyxl read-only for .xlsx), and
+        yields the normalized rows of every `batch_size` data rows, so
+        no DataFrame of a whole sheet is ever built.
+
+        Each sheet is read twice. The first pass only records its width,
+        the columns each section uses and the column dtypes parse()'s
+        reader would infer, so every batch gets the keys and values
+        parse() would give the same rows, wherever the batches split.
+        """
+        logger.info(f"Streaming Excel file: {path}")
+
+        with open(path, "rb") as f:
+            is_legacy = f.read(8) == OLE2_MAGIC
+
+        # pd.read_excel counts booleans as numbers; a DataFrame built
+        # from cell values (readonly, .xls) keeps them as they are
+        reader = self._choose_reader(Path(path))
+        bools_numeric = reader == "calamine" or (reader == "openpyxl" and not is_legacy)
+
+        for sheet in self._select_sheets(self._sheet_names(path, is_legacy)):
+            layout = self._scan_sheet(self._sheet_values(path, is_legacy, sheet), bools_numeric)
+            if layout is None:
+                continue
+            columns, keep, casts = layout
+
+            values = self._sheet_values(path, is_legacy, sheet)
+            self._next_header(values)
+
+            for chunk in iter_batches(self._section_rows(values, len(columns), casts), batch_size):
+                rows = []
+                for section, items in itertools.groupby(chunk, key=lambda item: item[0]):
+                    table = normalize_table(columns, [row for _, row in items], keep[section])
+                    rows.extend(table["rows"])
+                if rows:
+                    yield rows
+
+    @classmethod
+    def _scan_sheet(cls, values, bools_numeric=False):
+        """
+        First streaming pass: the sheet's column names (as wide as its
+        widest row, like pd.read_excel), per section the columns
+        normalize_table keeps, and the casts from _column_casts. None
+        for an empty sheet.
+        """
+        header = cls._next_header(values)
+        if header is None:
+            return None
+
+        kinds = {}
+        width = len(header)
+        used = []
+        for section, row in cls._section_rows(cls._track_kinds(values, kinds)):
+            width = max(width, len(row))
+            if section == len(used):
+                used.append(set())
+            used[section].update(i for i, value in enumerate(row) if not is_empty_value(value))
+
+        columns = cls._header_names(list(header) + [None] * (width - len(header)))
+        names = safe_headers(columns)
+
+        keep = [{names[i] for i in indexes} for indexes in used]
+        return columns, keep, cls._column_casts(kinds, bools_numeric)
+
+    @staticmethod
+    def _column_casts(kinds, bools_numeric):
+        """
+        {column index: float or int} for the columns pandas converts
+        when it infers their dtype from the whole sheet: numbers next to
+        blanks or floats become float64, booleans among ints (when
+        counted as numbers) become int64.
+        """
+        numeric = {"int", "float", "null", "bool"} if bools_numeric else {"int", "float", "null"}
+        casts = {}
+        for i, seen in kinds.items():
+            if not seen <= numeric or not seen - {"null"} or len(seen) < 2:
+                continue
+            casts[i] = int if seen <= {"int", "bool"} else float
+        return casts
+
+    @classmethod
+    def _track_kinds(cls, values, kinds):
+        """
+        Pass rows through unchanged, recording in `kinds` the kinds of
+        value ("int", "float", "bool", "null", "other") each column holds
+        over the whole sheet. Missing trailing cells count as null;
+        trailing blank rows do not, as pandas drops them.
+        """
+        width = 0
+        seen_rows = 0
+        blank_rows = 0
+        for row in values:
+            if all(value is None for value in row):
+                blank_rows += 1
+                yield row
+                continue
+
+            if blank_rows:
+                for i in range(width):
+                    kinds.setdefault(i, set()).add("null")
+                seen_rows += blank_rows
+                blank_rows = 0
+
+            if len(row) > width:
+                if seen_rows:
+                    for i in range(width, len(row)):
+                        kinds.setdefault(i, set()).add("null")
+                width = len(row)
+
+            for i in range(width):
+                value = row[i] if i < len(row) else None
+                kinds.setdefault(i, set()).add(cls._value_kind(value))
+            seen_rows += 1
+            yield row
+
+    @staticmethod
+    def _value_kind(value):
+        if value is None or (isinstance(value, float) and value != value):
+            return "null"
+        if isinstance(value, bool):
+            return "bool"
+        if isinstance(value, int):
+            return "int"
+        if isinstance(value, float):
+            return "float"
+        return "other"
+
+    @classmethod
+    def _section_rows(cls, values, width=0, casts=None):
+        """
+        (section index, row) for every data row, split into sections by
+        the same rules as _extract_tables. Cells are cleaned like
+        _clean_dataframe does (None → "") and padded to `width`; numbers
+        in `casts` columns are converted as the parse() reader would.
+        """
+        casts = casts or {}
+        section = 0
+        has_rows = False
+        for row in values:
+            row = [
+                "" if value is None
+                else casts[i](value) if i in casts and isinstance(value, (int, float))
+                else value
+                for i, value in enumerate(row)
+            ]
+            row += [""] * (width - len(row))
+
+            is_header, is_empty, _ = cls._classify_row(row)
+            if is_header and has_rows:
+                section += 1
+                has_rows = False
+            elif not is_empty:
+                has_rows = True
+                yield section, row
+
+    @staticmethod
+    def _choose_reader(file_path: Path) -> str:
+        reader = EXCEL_READER
+        if reader == "auto":
+            if file_path.stat().st_size < EXCEL_FAST_READER_MIN_BYTES:
+                return "openpyxl"
+            reader = "calamine"
+
+        if reader == "calamine" and not _HAS_CALAMINE:
+            logger.warning("python-calamine is not installed, using openpyxl read-only")
+            return "readonly"
+        return reader
+
+    @classmethod
+    def _values_dataframe(cls, values):
+        """
+        A sheet as pd.read_excel would return it, built from plain
+        cell values instead of a full openpyxl object model.
+        """
+        header = cls._next_header(values)
+        if header is None:
+            return pd.DataFrame()
+
+        rows = [list(row) for row in values]
+        # pd.read_excel drops trailing blank rows; kept, they turn int columns float
+        while rows and all(value is None for value in rows[-1]):
+            rows.pop()
+        width = max([len(header), *map(len, rows)])
+        columns = cls._header_names(list(header) + [None] * (width - len(header)))
+        return pd.DataFrame(
+            [row + [None] * (width - len(row)) for row in rows],
+            columns=columns,
+        )
+
+    @staticmethod
+    def _next_header(values):
+        # Like pandas, the first sheet row is the header even when blank
+        return next(values, None)
+
+    @classmethod
+    def _sheet_values(cls, path, is_legacy, sheet=0):
+        """
+        Rows of cell values from `sheet` (name or index), converted the
+        way pandas does: integral floats → int, empty strings → None.
+        """
+        if is_legacy:
+            rows = cls._iter_legacy_values(path, sheet)
+        else:
+            rows = cls._iter_xlsx_values(path, sheet)
+        for row in rows:
+            yield [
+                int(v) if isinstance(v, float) and v.is_integer()
+                else None if isinstance(v, str) and v == ""
+                else v
+                for v in row
+            ]
+
+    @staticmethod
+    def _iter_xlsx_values(path, sheet=0):
+        # A file object skips openpyxl's extension check (.xlsx saved as .xls)
+        with open(path, "rb") as f:
+            wb = load_workbook(f, read_only=True, data_only=True)
+            try:
+                ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
+                for row in ws.iter_rows(values_only=True):
+                    yield row
+            finally:
+                wb.close()
+
+    @staticmethod
+    def _iter_legacy_values(path, sheet=0):
+        # xlrd has no streaming mode, but rows are still handed out one at a time
+        book = xlrd.open_workbook(path, on_demand=True)
+        try:
+            sh = book.sheet_by_name(sheet) if isinstance(sheet, str) else book.sheet_by_index(sheet)
+            for r in range(sh.nrows):
+                yield [
+                    ExcelImporter._legacy_cell(ctype, value, book.datemode)
+                    for ctype, value in zip(sh.row_types(r), sh.row_values(r))
+                ]
+        finally:
+            book.release_resources()
+
+    @staticmethod
+    def _legacy_cell(ctype, value, datemode):
+        """
+        One xlrd cell typed as pd.read_excel would: dates as datetime
+        (time-only cells as time), booleans as bool, errors as None.
+        """
+        if ctype == xlrd.XL_CELL_DATE:
+            try:
+                parts = xlrd.xldate_as_tuple(value, datemode)
+            except (xlrd.xldate.XLDateError, ValueError, OverflowError):
+                return value
+            if parts[:3] == (0, 0, 0):
+                return time(*parts[3:])
+            return datetime(*parts)
+
+        if ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(value)
+
+        if ctype == xlrd.XL_CELL_ERROR:
+            return None
+
+        return value
+
+    @staticmethod
+    def _header_names(header):
+        """
+        Column names as pd.read_excel would give them: blanks become
+        "Unnamed: i", repeats get ".1", ".2", ...
+        """
+        names = []
+        seen = {}
+        for i, value in enumerate(header):
+            name = f"Unnamed: {i}" if value in (None, "") else value
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            names.append(name)
+        return names
+
+    def parse_dataframe(self, df) -> dict:
+        """
+        Same output as parse(), for a sheet already held in memory
+        (first row as header).
+        """
         df = self._clean_dataframe(df)
 
         if df.empty:
@@ -65,9 +493,23 @@ class ExcelImporter:
         df = df.dropna(axis=1, how="all")
         df = df.dropna(axis=0, how="all")
         df = df.reset_index(drop=True)
-        df = df.where(pd.notnull(df), "")
+        # Object columns keep each value's own type when rows are read back
+        df = df.astype(object).where(pd.notnull(df), "")
         return df
 
+    @staticmethod
+    def _classify_row(row_values):
+        """
+        (starts a section, is empty, row text) for one cleaned row.
+        """
+        row_str = " ".join(str(v).strip() for v in row_values if str(v).strip())
+        is_header = any(
+            k in row_str.upper()
+            for k in ["SERVICES", "MATERIALS", "PURCHASE", "TOTAL", "ORDER"]
+        )
+        is_empty = not any(str(v).strip() for v in row_values)
+        return is_header, is_empty, row_str
+
     @staticmethod
     def _extract_tables(df):
         tables = []
@@ -76,14 +518,7 @@ class ExcelImporter:
         section_rows = []
 
         for _, row in df.iterrows():
-            row_values = row.tolist()
-            row_str = " ".join(str(v).strip() for v in row_values if str(v).strip())
-
-            is_header = any(
-                k in row_str.upper()
-                for k in ["SERVICES", "MATERIALS", "PURCHASE", "TOTAL", "ORDER"]
-            )
-            is_empty = not any(str(v).strip() for v in row_values)
+            is_header, is_empty, row_str = ExcelImporter._classify_row(row.tolist())
 
             if is_header and section_rows:
                 sections.append((current_section, section_rows))
@@ -44,29 +44,15 @@ def detect_field_type(series: pd.Series) -> str:
     return "text"
 
 
-def normalize_table(columns, rows):
+def safe_headers(columns):
     """
-    A fully robust table normalizer that:
-    - fixes empty/duplicate headers
-    - handles messy PDF rows
-    - removes empty columns
-    - detects types
-    - converts NaN → None
+    Blank headers → Column_N, duplicates → name_1, name_2, ...
     """
-
-    # ---------------------------------------------
-    # 1. Create DataFrame with safe headers
-    # ---------------------------------------------
-    if not columns:
-        columns = [f"Column_{i+1}" for i in range(len(rows[0]))]
-
-    # Fix blank headers
     columns = [
         col if isinstance(col, str) and col.strip() != "" else f"Column_{i+1}"
         for i, col in enumerate(columns)
     ]
 
-    # Fix duplicate headers
     seen = {}
     unique_cols = []
     for col in columns:
@@ -76,37 +62,71 @@ def normalize_table(columns, rows):
         else:
             seen[col] += 1
             unique_cols.append(f"{col}_{seen[col]}")
+    return unique_cols
+
+
+def is_empty_column(series):
+    if isinstance(series, pd.DataFrame):
+        series = series.iloc[:, 0]
+
+    cleaned = (
+        series.dropna()
+              .astype(str)
+              .str.strip()
+              .str.lower()
+    )
+
+    return cleaned.empty or cleaned.isin(["", "nan"]).all()
+
+
+def is_empty_value(value) -> bool:
+    """
+    Per-value form of is_empty_column().
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return True
+    return str(value).strip().lower() in ("", "nan")
+
+
+def normalize_table(columns, rows, keep_columns=None):
+    """
+    A fully robust table normalizer that:
+    - fixes empty/duplicate headers
+    - handles messy PDF rows
+    - removes empty columns
+    - detects types
+    - converts NaN → None
 
-    df = pd.DataFrame(rows, columns=unique_cols)
+    `keep_columns` replaces the empty-column check: streamed tables
+    decide it once for the whole table, so every batch has the same keys.
+
+    Values are kept as given (object columns, no dtype inference), so
+    a value never depends on which other rows share the table.
+    """
 
     # ---------------------------------------------
-    # 2. Fix ragged rows (make all same length)
+    # 1. Safe headers
     # ---------------------------------------------
-    max_cols = len(df.columns)
-    df = df.apply(
-        lambda row: row.tolist() + [None] * (max_cols - len(row)),
-        axis=1,
-        result_type="expand"
-    )
-    df.columns = unique_cols
+    if not columns:
+        columns = [f"Column_{i+1}" for i in range(len(rows[0]))]
+
+    unique_cols = safe_headers(columns)
 
     # ---------------------------------------------
-    # 3. Drop columns that are fully empty
+    # 2. Fix ragged rows (make all same length)
     # ---------------------------------------------
-    def is_empty_column(series):
-        if isinstance(series, pd.DataFrame):
-            series = series.iloc[:, 0]
-
-        cleaned = (
-            series.dropna()
-                  .astype(str)
-                  .str.strip()
-                  .str.lower()
-        )
+    max_cols = len(unique_cols)
+    rows = [list(row) + [None] * (max_cols - len(row)) for row in rows]
 
-        return cleaned.empty or cleaned.isin(["", "nan"]).all()
+    df = pd.DataFrame(rows, columns=unique_cols, dtype=object)
 
-    non_empty_cols = [col for col in df.columns if not is_empty_column(df[col])]
+    # ---------------------------------------------
+    # 3. Drop columns that are fully empty
+    # ---------------------------------------------
+    if keep_columns is None:
+        non_empty_cols = [col for col in df.columns if not is_empty_column(df[col])]
+    else:
+        non_empty_cols = [col for col in df.columns if col in keep_columns]
     df = df[non_empty_cols]
 
     # ---------------------------------------------
@@ -130,3 +150,46 @@ def normalize_table(columns, rows):
         "rows": df.to_dict(orient="records"),
         "field_types": field_types,
     }
+
+
+def scan_chunks(chunks):
+    """
+    First pass over a chunked read_csv: returns (columns that are not
+    empty anywhere, dtype overrides). A column read as int in one chunk
+    and float in another is float in a full read, and one with text in
+    any chunk is text, so re-reading with the overrides gives every
+    chunk the values a single read would have.
+    """
+    non_empty = set()
+    kinds = {}
+
+    for chunk in chunks:
+        for name, col in zip(safe_headers(chunk.columns.tolist()), chunk.columns):
+            if name not in non_empty and not is_empty_column(chunk[col]):
+                non_empty.add(name)
+            kinds.setdefault(col, set()).add(chunk[col].dtype.kind)
+
+    dtypes = {}
+    for col, col_kinds in kinds.items():
+        if len(col_kinds) < 2:
+            continue
+        if col_kinds <= {"i", "u", "f"}:
+            dtypes[col] = "float64"
+        elif "O" in col_kinds and col_kinds - {"O", "b"}:
+            dtypes[col] = str
+
+    return non_empty, dtypes
+
+
+def iter_batches(rows, batch_size):
+    """
+    Group any row iterable into lists of at most `batch_size` rows.
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
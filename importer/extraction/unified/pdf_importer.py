@@ -6,6 +6,8 @@ from pdf2image import convert_from_path
 from pytesseract import Output
 from typing import List, Dict, Any
 
+from importer.extraction.unified.normalize import iter_batches
+
 # Camelot is optional
 try:
     import camelot
@@ -171,6 +173,7 @@ def extract_line_items(text: str):
 # MAIN IMPORTER
 # ----------------------------------------------------
 class PDFImporter:
+    VERSION = "1"
 
     def parse(self, path: str) -> List[Dict[str, Any]]:
         """
@@ -202,3 +205,30 @@ class PDFImporter:
 
         # NEVER return empty None
         return line_items
+
+    def iter_rows(self, path: str, batch_size: int = 1000):
+        """
+        Streaming counterpart of parse(): line items are extracted page
+        by page (one OCR image at a time for scanned PDFs) instead of
+        from the combined text of the whole document.
+        """
+        yield from iter_batches(
+            (item for text in self._iter_page_text(path) for item in extract_line_items(text)),
+            batch_size,
+        )
+
+    @staticmethod
+    def _iter_page_text(path: str):
+        with pdfplumber.open(path) as pdf:
+            page_count = len(pdf.pages)
+
+            if has_text_layer(path):
+                for p in pdf.pages:
+                    yield clean_text(p.extract_text() or "")
+                    # pdfplumber caches parsed objects on every page it visits
+                    p.flush_cache()
+                return
+
+        for number in range(1, page_count + 1):
+            image = convert_from_path(path, dpi=300, first_page=number, last_page=number)[0]
+            yield clean_text(pytesseract.image_to_string(image))
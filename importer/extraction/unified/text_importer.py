@@ -1,11 +1,13 @@
 # parsers/unified/text_importer.py
 from pathlib import Path
 import pandas as pd
-from importer.extraction.unified.normalize import normalize_table
+from importer.extraction.unified.normalize import normalize_table, scan_chunks
 from config.logger import logger
 
 
 class TextImporter:
+    VERSION = "2"
+
     def parse(self, path: str) -> dict:
         """
         Parse a TXT file.
@@ -30,7 +32,8 @@ class TextImporter:
                 df = pd.read_csv(path, delimiter=delimiter)
 
                 columns = df.columns.tolist()
-                rows = df.values.tolist()
+                # Per-column values: .values alone upcasts ints when every column is numeric
+                rows = df.astype(object).values.tolist()
                 table = normalize_table(columns, rows)
 
                 return {
@@ -53,3 +56,42 @@ class TextImporter:
             "raw_json": None,
             "rows": [],  # IMPORTANT: no rows, but NOT an error
         }
+
+    def iter_rows(self, path: str, batch_size: int = 1000):
+        """
+        Streaming counterpart of parse(): delimited files are read in
+        chunks of `batch_size` lines (after a first pass that fixes the
+        column set and dtypes); free text has no rows.
+        """
+        logger.info(f"Streaming TXT file: {path}")
+
+        # Sniff the delimiter from the start instead of reading it all
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            head = f.read(64 * 1024)
+
+        delimiter = None
+        if "," in head:
+            delimiter = ","
+        elif "\t" in head:
+            delimiter = "\t"
+
+        if not delimiter:
+            logger.info("TXT file has no detectable table; no rows to stream")
+            return
+
+        yielded = False
+        try:
+            keep, dtypes = scan_chunks(pd.read_csv(path, delimiter=delimiter, chunksize=batch_size))
+            for chunk in pd.read_csv(path, delimiter=delimiter, chunksize=batch_size, dtype=dtypes):
+                rows = normalize_table(chunk.columns.tolist(), chunk.astype(object).values.tolist(), keep)["rows"]
+                if rows:
+                    yielded = True
+                    yield rows
+        except Exception as e:
+            if yielded:
+                # Rows already handed out; a silent stop would truncate
+                raise
+            logger.warning(
+                "TXT table parse failed, no rows streamed",
+                extra={"error": str(e)},
+            )
@@ -1,10 +1,12 @@
 # parsers/unified/word_importer.py
 from docx import Document
-from importer.extraction.unified.normalize import normalize_table
+from importer.extraction.unified.normalize import normalize_table, iter_batches
 from config.logger import logger
 
 
 class WordImporter:
+    VERSION = "2"
+
     def parse(self, path: str) -> dict:
         """
         Parse the first table in a .docx file into unified format.
@@ -17,6 +19,7 @@ class WordImporter:
             raise ValueError("No tables found in Word document")
 
         normalized_tables = []
+        flattened_rows = []
 
         for table in tables:
             rows = []
@@ -27,6 +30,28 @@ class WordImporter:
             for row in table.rows[1:]:
                 rows.append([cell.text.strip() for cell in row.cells])
 
-            normalized_tables.append(normalize_table(columns, rows))
+            normalized = normalize_table(columns, rows)
+            normalized_tables.append(normalized)
+            flattened_rows.extend(normalized["rows"])
+
+        return {"tables": normalized_tables, "rows": flattened_rows}
+
+    def iter_rows(self, path: str, batch_size: int = 1000):
+        """
+        Streaming counterpart of parse(): yields normalized rows table
+        by table. python-docx loads the whole document, so this mainly
+        avoids holding every normalized table at once.
+        """
+        logger.info(f"Streaming Word file: {path}")
+        doc = Document(path)
+
+        if not doc.tables:
+            raise ValueError("No tables found in Word document")
+
+        def rows():
+            for table in doc.tables:
+                columns = [cell.text.strip() for cell in table.rows[0].cells]
+                body = [[cell.text.strip() for cell in row.cells] for row in table.rows[1:]]
+                yield from normalize_table(columns, body)["rows"]
 
-        return {"tables": normalized_tables}
+        yield from iter_batches(rows(), batch_size)
@@ -0,0 +1,105 @@
+import sys
+import time
+import shutil
+import resource
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from importer.connectors import email_reader
+from importer.connectors.local_imap import generate_corpus, start_server_process
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Command(BaseCommand):
+    help = "Benchmark fetch_and_process_all against a local IMAP stand-in"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=100, help="Messages to generate")
+        parser.add_argument("--min-size-kb", type=int, default=10, help="Smallest message size")
+        parser.add_argument("--max-size-mb", type=int, default=50, help="Largest message size")
+        parser.add_argument("--seed", type=int, default=42, help="Corpus random seed")
+        parser.add_argument(
+            "--corpus-dir",
+            default=None,
+            help="Reuse/keep .eml corpus here (default: temporary, generated per run)",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--fetch-mode",
+            choices=["rfc822", "bodystructure"],
+            default=None,
+            help="Default: EMAIL_FETCH_MODE",
+        )
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Commit the RawFile/ExtractedRecord rows instead of rolling back",
+        )
+
+    def handle(self, *args, **options):
+        work_dir = Path(tempfile.mkdtemp(prefix="email_bench_"))
+        corpus_dir = Path(options["corpus_dir"] or work_dir / "corpus")
+
+        if not any(corpus_dir.glob("*.eml")):
+            self.stdout.write(f"🧪 Generating {options['messages']} messages in {corpus_dir}...")
+            generate_corpus(
+                corpus_dir,
+                count=options["messages"],
+                min_bytes=options["min_size_kb"] * 1024,
+                max_bytes=options["max_size_mb"] * 1024 * 1024,
+                seed=options["seed"],
+            )
+
+        corpus_bytes = sum(p.stat().st_size for p in corpus_dir.glob("*.eml"))
+        server, port = start_server_process(corpus_dir)
+
+        account = {
+            "name": "benchmark",
+            "host": "127.0.0.1",
+            "port": port,
+            "use_ssl": False,
+            "user": f"benchmark-{time.time_ns()}",
+            "password": "benchmark",
+            "mailboxes": ["INBOX"],
+        }
+
+        try:
+            with override_settings(MEDIA_ROOT=work_dir / "media"), transaction.atomic():
+                started = time.perf_counter()
+                stats = email_reader.fetch_and_process_all(
+                    batch_size=options["batch_size"],
+                    account=account,
+                    fetch_mode=options["fetch_mode"],
+                )
+                elapsed = time.perf_counter() - started
+
+                if not options["keep_data"]:
+                    transaction.set_rollback(True)
+        finally:
+            server.terminate()
+            server.join()
+            if options["corpus_dir"]:
+                shutil.rmtree(work_dir / "media", ignore_errors=True)
+            else:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        mb = corpus_bytes / (1024 * 1024)
+        self.stdout.write("\n" + "=" * 60)
+        self.stdout.write("EMAIL INGEST BENCHMARK")
+        self.stdout.write("=" * 60)
+        self.stdout.write(f"Fetch mode:    {options['fetch_mode'] or email_reader.FETCH_MODE}")
+        self.stdout.write(f"Messages:      {stats['messages']} ({stats['failed']} failed)")
+        self.stdout.write(f"Corpus size:   {mb:.1f} MB")
+        self.stdout.write(f"Elapsed:       {elapsed:.2f}s")
+        self.stdout.write(f"Throughput:    {stats['messages'] / elapsed:.1f} msg/s, {mb / elapsed:.1f} MB/s")
+        self.stdout.write(f"Peak RSS:      {_peak_rss_mb():.0f} MB")
+        self.stdout.write("=" * 60 + "\n")
@@ -1,17 +1,81 @@
 from django.core.management.base import BaseCommand
-from importer.connectors.email_reader import fetch_and_process_all
+from importer.connectors.multi_mailbox import fetch_all_mailboxes
 from importer.connectors.raw_folder_processor import process_raw_folder
+from importer.connectors.extraction_pipeline import ExtractionPipeline
 
 
 
 class Command(BaseCommand):
     help = "Fetch emails, save attachments, and run extraction pipeline"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Messages per IMAP FETCH/STORE round trip (default: EMAIL_FETCH_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--max-connections",
+            type=int,
+            default=None,
+            help="Upper bound on concurrent IMAP connections (default: EMAIL_MAX_CONNECTIONS)",
+        )
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Extract attachments while the fetch is still running",
+        )
+        parser.add_argument(
+            "--extract-workers",
+            type=int,
+            default=None,
+            help="Extraction threads in --pipeline mode (default: EXTRACT_WORKERS)",
+        )
+        parser.add_argument(
+            "--queue-size",
+            type=int,
+            default=None,
+            help="Files queued for extraction before the fetch waits (default: EXTRACT_QUEUE_SIZE)",
+        )
+
     def handle(self, *args, **options):
+        pipeline = None
+        if options["pipeline"]:
+            pipeline = ExtractionPipeline(
+                workers=options["extract_workers"],
+                queue_size=options["queue_size"],
+            )
+            self.stdout.write(
+                f"🔀 Pipelined extraction with {pipeline.workers} workers"
+            )
+            pipeline.start()
+
         self.stdout.write("📧 Starting email fetch...")
-        fetch_and_process_all()
+        try:
+            stats = fetch_all_mailboxes(
+                batch_size=options["batch_size"],
+                max_connections=options["max_connections"],
+                on_stored=pipeline.submit if pipeline else None,
+            )
+        finally:
+            if pipeline:
+                pipeline.close()
+
+        self.stdout.write(
+            f"📨 Fetched {stats['messages']} emails in {stats['seconds']:.1f}s "
+            f"({stats['rate']:.1f} msg/s, {stats['failed']} failed, {stats['skipped']} already ingested)"
+        )
+
+        if pipeline:
+            latency = pipeline.first_latency
+            self.stdout.write(
+                f"⚙️ Extracted {pipeline.stats['ok']} files during fetch"
+                + (f", first after {latency:.1f}s" if latency is not None else "")
+            )
 
+        # Sweep files left over from earlier runs or other drop-ins
         self.stdout.write("📦 Processing raw files...")
         process_raw_folder()
 
-        self.stdout.write("✅ Email fetch & extraction completed")
\ No newline at end of file
+        self.stdout.write("✅ Email fetch & extraction completed")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from importer.connectors.imap_idle import listen_for_new_mail, IDLE_TIMEOUT
+from importer.connectors.raw_folder_processor import process_raw_folder
+
+
+class Command(BaseCommand):
+    help = "Keep an IMAP connection open and ingest emails as they arrive (IDLE)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Messages per IMAP FETCH/STORE round trip (default: EMAIL_FETCH_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--idle-timeout",
+            type=int,
+            default=IDLE_TIMEOUT,
+            help="Seconds before IDLE is re-issued (default: EMAIL_IDLE_TIMEOUT)",
+        )
+        parser.add_argument(
+            "--no-extract",
+            action="store_true",
+            help="Only save emails to raw_files; leave extraction to process_raw_folder",
+        )
+
+    def handle(self, *args, **options):
+        def on_ingested(stats):
+            self.stdout.write(f"📨 Ingested {stats['messages']} emails")
+            if not options["no_extract"]:
+                process_raw_folder()
+
+        self.stdout.write("👂 Listening for new emails (Ctrl+C to stop)...")
+        listen_for_new_mail(
+            on_ingested=on_ingested,
+            batch_size=options["batch_size"],
+            idle_timeout=options["idle_timeout"],
+        )
+        self.stdout.write("✅ Email listener stopped")
@@ -1,9 +1,74 @@
+import signal
+
 from django.core.management.base import BaseCommand
 from importer.connectors.raw_folder_processor import process_raw_folder
+from importer.connectors.raw_folder_watcher import watch_raw_folder, SETTLE_SECONDS
 
 
 class Command(BaseCommand):
     help = "Process raw files from media folder"
 
-    def handle(self, *args, **kwargs):
-        process_raw_folder()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Worker processes, one file per task (default: 1, in-process)",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=None,
+            help="Seconds before a file is abandoned in --workers mode (default: RAW_FILE_TIMEOUT)",
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Keep running and process files as soon as they are written (inotify)",
+        )
+        parser.add_argument(
+            "--settle",
+            type=float,
+            default=SETTLE_SECONDS,
+            help="Seconds a file's size must stay unchanged in --watch mode (default: RAW_WATCH_SETTLE_SECONDS)",
+        )
+
+    def _watch(self, options):
+        def _stop(signum, frame):
+            raise KeyboardInterrupt
+
+        # systemd/supervisor stop the daemon with SIGTERM
+        signal.signal(signal.SIGTERM, _stop)
+
+        def on_processed(result):
+            icon = "✅" if result["status"] == "ok" else "❌"
+            self.stdout.write(f"{icon} {result['file']} ({result['seconds']:.2f}s)")
+
+        self.stdout.write("👀 Watching raw_files (Ctrl+C to stop)...")
+        watch_raw_folder(
+            workers=options["workers"],
+            settle_seconds=options["settle"],
+            on_processed=on_processed,
+        )
+        self.stdout.write("✅ Raw folder watcher stopped")
+
+    def handle(self, *args, **options):
+        if options["watch"]:
+            return self._watch(options)
+
+        results = process_raw_folder(workers=options["workers"], timeout=options["timeout"])
+        if not results:
+            self.stdout.write("📭 No raw files to process")
+            return
+
+        self.stdout.write("\n⏱️ Per-file timings (slowest first)")
+        for r in sorted(results, key=lambda r: r["seconds"], reverse=True):
+            self.stdout.write(
+                f"  {r['seconds']:8.2f}s  {r['status']:<8} {r.get('lane', ''):<5} {r['file']}"
+            )
+
+        ok = sum(1 for r in results if r["status"] == "ok")
+        self.stdout.write(
+            f"✅ {ok}/{len(results)} files processed, "
+            f"{sum(r['seconds'] for r in results):.1f}s of extraction time"
+        )
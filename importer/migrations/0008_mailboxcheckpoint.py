@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0007_alter_rawfile_options_rawfile_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(max_length=255)),
+                ('mailbox', models.CharField(max_length=255)),
+                ('uidvalidity', models.BigIntegerField(blank=True, null=True)),
+                ('last_uid', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('account', 'mailbox')},
+            },
+        ),
+    ]
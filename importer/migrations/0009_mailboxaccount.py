@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0008_mailboxcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('host', models.CharField(max_length=255)),
+                ('port', models.IntegerField(default=993)),
+                ('use_ssl', models.BooleanField(default=True)),
+                ('username', models.CharField(max_length=255)),
+                ('password_env', models.CharField(help_text='Name of the environment variable holding the password', max_length=100)),
+                ('mailboxes', models.CharField(default='INBOX', help_text='Comma separated folders to ingest', max_length=500)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0009_mailboxaccount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawfile',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier file with identical content whose extraction is reused', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='importer.rawfile'),
+        ),
+        migrations.AddField(
+            model_name='rawfile',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
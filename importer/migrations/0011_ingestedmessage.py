@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0010_rawfile_sha256_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(max_length=255, unique=True)),
+                ('account', models.CharField(max_length=255)),
+                ('mailbox', models.CharField(max_length=255)),
+                ('uidvalidity', models.BigIntegerField(blank=True, null=True)),
+                ('uid', models.BigIntegerField(blank=True, null=True)),
+                ('sender', models.CharField(blank=True, max_length=255)),
+                ('attachment_hashes', models.JSONField(blank=True, default=list)),
+                ('ingested_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
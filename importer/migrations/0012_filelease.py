@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0011_ingestedmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True)),
+                ('owner', models.CharField(max_length=255)),
+                ('claimed_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
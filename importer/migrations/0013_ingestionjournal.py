@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0012_filelease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionJournal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(db_index=True, max_length=500)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('state', models.CharField(choices=[('discovered', 'Discovered'), ('claimed', 'Claimed'), ('parsed', 'Parsed'), ('persisted', 'Persisted'), ('archived', 'Archived')], db_index=True, default='discovered', max_length=20)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('raw_file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_entries', to='importer.rawfile')),
+            ],
+        ),
+    ]
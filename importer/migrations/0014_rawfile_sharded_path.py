@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0013_ingestionjournal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rawfile',
+            name='raw_file',
+            field=models.FileField(db_index=True, max_length=500, upload_to='uploads/%Y/%m/%d/', verbose_name='Upload File'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0014_rawfile_sharded_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('importer', models.CharField(max_length=50)),
+                ('version', models.CharField(max_length=20)),
+                ('payload', models.BinaryField()),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'unique_together': {('sha256', 'importer', 'version')},
+            },
+        ),
+    ]
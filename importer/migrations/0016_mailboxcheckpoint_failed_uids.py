@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-16 23:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0015_parsecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mailboxcheckpoint',
+            name='failed_uids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
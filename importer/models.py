@@ -7,7 +7,13 @@ from django.conf import settings
 # RAW UPLOADED FILE
 # -----------------------------
 class RawFile(models.Model):
-    raw_file = models.FileField(upload_to="raw_files/", verbose_name="Upload File")
+    # Uploads are sharded by day; raw-folder files point at their archive shard
+    raw_file = models.FileField(
+        upload_to="uploads/%Y/%m/%d/",
+        max_length=500,
+        db_index=True,
+        verbose_name="Upload File",
+    )
     file_name = models.CharField(max_length=255, blank=True)
     file_type = models.CharField(max_length=50, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -23,6 +29,16 @@ class RawFile(models.Model):
     raw_text = models.TextField(null=True, blank=True)
     raw_json = models.JSONField(null=True, blank=True)
 
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    duplicate_of = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="duplicates",
+        help_text="Earlier file with identical content whose extraction is reused"
+    )
+
     def save(self, *args, **kwargs):
         if self.raw_file:
             self.file_name = os.path.basename(self.raw_file.name)
@@ -166,3 +182,175 @@ class ProcessProgress(models.Model):
         return self.key
 
 
+# -----------------------------
+# IMAP MAILBOX REGISTRY
+# -----------------------------
+class MailboxAccount(models.Model):
+    """
+    An IMAP account to ingest from.
+    The password is read from the environment variable named in
+    `password_env` so no secret is stored in the database.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    host = models.CharField(max_length=255)
+    port = models.IntegerField(default=993)
+    use_ssl = models.BooleanField(default=True)
+    username = models.CharField(max_length=255)
+    password_env = models.CharField(
+        max_length=100,
+        help_text="Name of the environment variable holding the password"
+    )
+    mailboxes = models.CharField(
+        max_length=500,
+        default="INBOX",
+        help_text="Comma separated folders to ingest"
+    )
+    is_active = models.BooleanField(default=True)
+
+    def as_config(self) -> dict:
+        return {
+            "name": self.name,
+            "host": self.host,
+            "port": self.port,
+            "use_ssl": self.use_ssl,
+            "user": self.username,
+            "password": os.getenv(self.password_env),
+            "mailboxes": [m.strip() for m in self.mailboxes.split(",") if m.strip()],
+        }
+
+    def __str__(self):
+        return f"{self.name} ({self.username})"
+
+
+# -----------------------------
+# IMAP SYNC CHECKPOINT
+# -----------------------------
+class MailboxCheckpoint(models.Model):
+    """
+    Highest UID ingested per account/mailbox, plus the UIDs below it
+    that failed. Only valid while the server's UIDVALIDITY is unchanged.
+    """
+
+    account = models.CharField(max_length=255)
+    mailbox = models.CharField(max_length=255)
+    uidvalidity = models.BigIntegerField(null=True, blank=True)
+    last_uid = models.BigIntegerField(default=0)
+    # UIDs at or below last_uid that failed; retried on every sync
+    failed_uids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("account", "mailbox")
+
+    def __str__(self):
+        return f"{self.account} | {self.mailbox} | UID {self.last_uid}"
+
+
+# -----------------------------
+# INGESTED EMAIL LEDGER
+# -----------------------------
+class IngestedMessage(models.Model):
+    """
+    One row per fully ingested email, keyed by Message-ID.
+    The reader skips any message already in the ledger.
+    """
+
+    message_id = models.CharField(max_length=255, unique=True)
+    account = models.CharField(max_length=255)
+    mailbox = models.CharField(max_length=255)
+    uidvalidity = models.BigIntegerField(null=True, blank=True)
+    uid = models.BigIntegerField(null=True, blank=True)
+
+    sender = models.CharField(max_length=255, blank=True)
+    attachment_hashes = models.JSONField(default=list, blank=True)
+    ingested_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.message_id} | {self.account}/{self.mailbox} UID {self.uid}"
+
+
+# -----------------------------
+# RAW FILE LEASES
+# -----------------------------
+class FileLease(models.Model):
+    """
+    Claim on one file in media/raw_files, so that exactly one worker
+    (on any host) processes it. An expired lease can be taken over.
+    """
+
+    path = models.CharField(max_length=500, unique=True)
+    owner = models.CharField(max_length=255)
+    claimed_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.path} → {self.owner} (until {self.expires_at})"
+
+
+# -----------------------------
+# RAW FOLDER INGESTION JOURNAL
+# -----------------------------
+class IngestionJournal(models.Model):
+    """
+    Last completed stage of one raw file, so a restarted processor
+    resumes where it stopped instead of re-parsing from scratch.
+    """
+
+    STATE_CHOICES = (
+        ("discovered", "Discovered"),
+        ("claimed", "Claimed"),      # RawFile row exists
+        ("parsed", "Parsed"),        # payload stored below
+        ("persisted", "Persisted"),  # ExtractedRecord/ZSO rows saved
+        ("archived", "Archived"),    # moved to media/processed
+    )
+
+    path = models.CharField(max_length=500, db_index=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default="discovered", db_index=True)
+
+    raw_file = models.ForeignKey(
+        RawFile,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="journal_entries",
+    )
+    # Parsed payload, kept only between "parsed" and "persisted"
+    payload = models.JSONField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path} | {self.state}"
+
+
+# -----------------------------
+# PARSE RESULT CACHE
+# -----------------------------
+class ParseCacheEntry(models.Model):
+    """
+    zlib-compressed JSON payload of one importer run, keyed by file
+    content and importer version. Bumping an importer's VERSION makes
+    its old entries unreachable; LRU eviction removes them later.
+    """
+
+    sha256 = models.CharField(max_length=64)
+    importer = models.CharField(max_length=50)
+    version = models.CharField(max_length=20)
+
+    payload = models.BinaryField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ("sha256", "importer", "version")
+
+    def __str__(self):
+        return f"{self.sha256[:12]} | {self.importer} v{self.version}"
@@ -0,0 +1,106 @@
+"""
+Content-addressed file store for raw_files and the processed archive.
+
+Every file is written under a name that embeds its SHA-256, so two
+different files sharing a name never overwrite each other and the same
+bytes always land on the same path.
+
+The archive is sharded as processed/YYYY/MM/DD/<sha256[:2]>/<name>, so
+no directory grows without bound; RawFile.raw_file holds the path.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def sha256_file(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def addressed_name(filename: str, sha256: str) -> str:
+    """
+    "PO.xlsx" + hash → "PO_<first 12 hex>.xlsx"
+    """
+    path = Path(filename)
+    return f"{path.stem}_{sha256[:12]}{path.suffix}"
+
+
+def store_stream(chunks, filename, directory=None):
+    """
+    Write an iterable of byte chunks, hashing while writing.
+
+    Returns (path, sha256). If the same content is already stored the
+    temporary copy is discarded and the existing path is returned.
+    """
+    directory = Path(directory or Path(settings.MEDIA_ROOT) / "raw_files")
+    directory.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".incoming_")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+
+        sha256 = digest.hexdigest()
+        final_path = directory / addressed_name(filename, sha256)
+
+        if final_path.exists():
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return final_path, sha256
+
+
+def store_bytes(data: bytes, filename, directory=None):
+    return store_stream([data or b""], filename, directory)
+
+
+def archive_relpath(filename, sha256: str, when=None) -> str:
+    """
+    MEDIA_ROOT-relative archive path, e.g.
+    "processed/2026/10/16/ab/PO_ab12cd34ef56.xlsx".
+    Deterministic for a given (filename, sha256, day).
+    """
+    when = when or timezone.now()
+    name = Path(filename).name
+    if sha256[:12] not in name:
+        name = addressed_name(name, sha256)
+    return f"processed/{when:%Y/%m/%d}/{sha256[:2]}/{name}"
+
+
+def archive_file(src, sha256: str, when=None) -> str:
+    """
+    Move a processed file into its archive shard and return the
+    relative path. Identical content already archived there is kept.
+    """
+    relpath = archive_relpath(Path(src).name, sha256, when)
+    dest = Path(settings.MEDIA_ROOT) / relpath
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    if dest.exists():
+        os.remove(src)
+    else:
+        shutil.move(str(src), dest)
+    return relpath
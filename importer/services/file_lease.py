@@ -0,0 +1,160 @@
+"""
+DB-backed lease protocol for media/raw_files.
+
+Any number of processes on any number of hosts may scan the same raw
+folder; a file is only worked on by the process holding its lease.
+Claiming is a single INSERT (or a conditional UPDATE of an expired
+row), so the database decides every race.
+
+A holder renews its lease with a heartbeat while it works, and checks
+it still owns the file before every write that must not happen twice.
+"""
+
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from importer.models import FileLease
+from config.logger import logger
+
+
+# Lease length; renewed by the heartbeat, so it only has to outlive a stall
+LEASE_SECONDS = int(os.getenv("RAW_FILE_LEASE_SECONDS", 1200))
+
+# Seconds between lease renewals while a file is being processed
+HEARTBEAT_SECONDS = int(os.getenv("RAW_FILE_LEASE_HEARTBEAT_SECONDS", LEASE_SECONDS // 3))
+
+
+class LeaseLost(Exception):
+    """
+    The lease expired and another worker took the file over.
+    """
+
+
+def lease_owner() -> str:
+    # pid changes per pool worker, so leases are per process
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_is_dead(owner: str) -> bool:
+    """
+    True only for a lease held by a process on this host that no longer
+    exists (e.g. killed by the OOM killer); other hosts wait for expiry.
+    """
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+def claim(path: str, seconds=None) -> bool:
+    """
+    Try to take the lease on `path`. Returns True if this process owns it.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=seconds or LEASE_SECONDS)
+    owner = lease_owner()
+
+    try:
+        with transaction.atomic():
+            FileLease.objects.create(path=path, owner=owner, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        pass
+
+    # Held already: take it over only if the holder's lease ran out
+    taken = (
+        FileLease.objects
+        .filter(path=path, expires_at__lt=now)
+        .update(owner=owner, expires_at=expires_at, claimed_at=now)
+    )
+    if taken:
+        return True
+
+    # ...or its holder on this host has died
+    holder = FileLease.objects.filter(path=path).values_list("owner", flat=True).first()
+    if holder and holder != owner and _owner_is_dead(holder):
+        taken = (
+            FileLease.objects
+            .filter(path=path, owner=holder)
+            .update(owner=owner, expires_at=expires_at, claimed_at=now)
+        )
+    return taken == 1
+
+
+def renew(path: str, seconds=None) -> bool:
+    """
+    Push this process's lease on `path` forward. False if it is no
+    longer ours.
+    """
+    expires_at = timezone.now() + timedelta(seconds=seconds or LEASE_SECONDS)
+    return (
+        FileLease.objects
+        .filter(path=path, owner=lease_owner())
+        .update(expires_at=expires_at)
+    ) == 1
+
+
+def ensure(path: str):
+    """
+    Fence a write: raise LeaseLost unless this process still holds `path`.
+    The lease is renewed in the same UPDATE, so it cannot lapse in between.
+    """
+    if not renew(path):
+        raise LeaseLost(f"Lease on {path} was taken over by another worker")
+
+
+class Heartbeat:
+    """
+    with Heartbeat(path):
+        ...  # lease on `path` is renewed every HEARTBEAT_SECONDS
+    """
+
+    def __init__(self, path, interval=None):
+        self.path = path
+        self.interval = interval or HEARTBEAT_SECONDS
+        self.owner = lease_owner()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{path}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not renew(self.path):
+                        logger.warning(f"Lost lease on {self.path}; stopping heartbeat")
+                        return
+                except Exception as e:
+                    # e.g. SQLite busy; the next beat retries well before expiry
+                    logger.warning(f"Lease heartbeat for {self.path} failed: {e}")
+        finally:
+            # The thread owns its own DB connection
+            connection.close()
+
+
+def release(path: str):
+    FileLease.objects.filter(path=path, owner=lease_owner()).delete()
@@ -0,0 +1,83 @@
+"""
+Per-file ingestion journal for media/raw_files.
+
+Every stage boundary (discovered → claimed → parsed → persisted →
+archived) is committed before the next stage starts. After a crash the
+processor reopens the file's entry and continues from the last
+completed stage; an expensive OCR parse is never repeated once its
+payload has been journaled.
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+
+from importer.models import IngestionJournal
+from importer.services import content_store
+from config.logger import logger
+
+
+STATES = [state for state, _ in IngestionJournal.STATE_CHOICES]
+
+
+def open_entry(path: str, sha256: str) -> IngestionJournal:
+    """
+    The unfinished entry for this path + content, or a new one.
+    """
+    entry = (
+        IngestionJournal.objects
+        .filter(path=path, sha256=sha256)
+        .exclude(state="archived")
+        .select_related("raw_file")
+        .order_by("-id")
+        .first()
+    )
+
+    if entry is None:
+        entry = IngestionJournal.objects.create(path=path, sha256=sha256)
+    elif entry.state != "discovered" and entry.raw_file is None:
+        # Its RawFile was deleted; nothing after discovery can be trusted
+        entry.state = "discovered"
+        entry.payload = None
+
+    entry.attempts += 1
+    entry.save(update_fields=["state", "payload", "attempts", "updated_at"])
+    return entry
+
+
+def advance(entry: IngestionJournal, state: str, **fields):
+    """
+    Record that `state` is complete (plus any fields set along with it).
+    """
+    if STATES.index(state) <= STATES.index(entry.state):
+        raise ValueError(f"Journal cannot move from {entry.state} to {state}")
+
+    entry.state = state
+    for name, value in fields.items():
+        setattr(entry, name, value)
+
+    entry.save(update_fields=["state", "updated_at", *fields])
+
+
+def recover():
+    """
+    Close entries whose file was archived but whose "archived" write was
+    lost (crash between the move and the journal update).
+    """
+    media_root = Path(settings.MEDIA_ROOT)
+    recovered = 0
+
+    for entry in IngestionJournal.objects.filter(state="persisted").select_related("raw_file"):
+        relpath = content_store.archive_relpath(entry.path, entry.sha256, entry.created_at)
+        if (media_root / entry.path).exists() or not (media_root / relpath).exists():
+            continue
+
+        if entry.raw_file is not None and entry.raw_file.raw_file.name != relpath:
+            entry.raw_file.raw_file.name = relpath
+            entry.raw_file.save(update_fields=["raw_file", "file_name", "file_type"])
+        advance(entry, "archived")
+        recovered += 1
+
+    if recovered:
+        logger.info(f"Journal recovery: {recovered} files were already archived")
+    return recovered
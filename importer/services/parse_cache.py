@@ -0,0 +1,117 @@
+"""
+Persistent parse-result cache.
+
+UnifiedImporter payloads are stored zlib-compressed, keyed by
+(file SHA-256, importer name, importer version key). Re-uploads,
+reprocessing and identical attachments from different emails reuse
+the stored payload instead of parsing (or OCR-ing) again. Least
+recently used entries are evicted once the cache exceeds its byte
+budget.
+
+The version key is the importer's VERSION plus a hash of its
+cache_fingerprint(), if it has one: settings that change its output
+(e.g. EXCEL_SHEETS) then never serve a payload parsed under others.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from importer.models import ParseCacheEntry
+from importer.services.json_utils import make_json_safe
+from config.logger import logger
+
+
+# Set to false to always parse from scratch
+ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Compressed bytes kept before LRU eviction
+MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def version_key(importer_cls) -> str:
+    version = str(getattr(importer_cls, "VERSION", "0"))
+    fingerprint = getattr(importer_cls, "cache_fingerprint", None)
+    if fingerprint is None:
+        return version
+    digest = hashlib.sha1(fingerprint().encode("utf-8")).hexdigest()[:12]
+    return f"{version}+{digest}"
+
+
+def get(sha256, importer, version):
+    if not ENABLED or not sha256:
+        return None
+
+    entry = (
+        ParseCacheEntry.objects
+        .filter(sha256=sha256, importer=importer, version=version)
+        .only("id", "payload")
+        .first()
+    )
+    if entry is None:
+        return None
+
+    ParseCacheEntry.objects.filter(id=entry.id).update(
+        hits=F("hits") + 1,
+        last_used_at=timezone.now(),
+    )
+
+    try:
+        return json.loads(zlib.decompress(bytes(entry.payload)))
+    except (zlib.error, ValueError) as e:
+        logger.warning(f"Dropping unreadable parse cache entry {entry.id}: {e}")
+        entry.delete()
+        return None
+
+
+def put(sha256, importer, version, payload):
+    if not ENABLED or not sha256:
+        return
+
+    blob = zlib.compress(json.dumps(make_json_safe(payload), default=str).encode("utf-8"))
+
+    try:
+        with transaction.atomic():
+            ParseCacheEntry.objects.create(
+                sha256=sha256,
+                importer=importer,
+                version=version,
+                payload=blob,
+                size_bytes=len(blob),
+            )
+    except IntegrityError:
+        # Another worker cached the same file first
+        return
+
+    evict()
+
+
+def evict(max_bytes=None):
+    """
+    Delete least recently used entries until the cache fits its budget.
+    """
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    total = ParseCacheEntry.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
+    if total <= max_bytes:
+        return 0
+
+    doomed = []
+    for entry_id, size in (
+        ParseCacheEntry.objects
+        .order_by("last_used_at")
+        .values_list("id", "size_bytes")
+        .iterator()
+    ):
+        doomed.append(entry_id)
+        total -= size
+        if total <= max_bytes:
+            break
+
+    ParseCacheEntry.objects.filter(id__in=doomed).delete()
+    logger.info(f"Parse cache: evicted {len(doomed)} entries")
+    return len(doomed)
@@ -1,7 +1,9 @@
+import os
 import json
 from pathlib import Path
 from django.utils.dateparse import parse_date
 from django.db import transaction
+from django.conf import settings
 
 from importer.models import (
     RawFile,
@@ -9,7 +11,16 @@ from importer.models import (
     ExtractionLog,
 )
 from importer.extraction.router import UnifiedImporter
+from importer.extraction.sandbox import ParseKilled
 from importer.services.zso_mapper import map_extracted_to_zso
+from importer.services.content_store import sha256_file
+
+
+# Files at least this large are parsed and saved in row batches
+STREAM_MIN_BYTES = int(os.getenv("PROCESS_STREAM_MIN_BYTES", 20 * 1024 * 1024))
+
+# Rows per batch when streaming
+STREAM_BATCH_ROWS = int(os.getenv("PROCESS_STREAM_BATCH_ROWS", 2000))
 
 
 # ---------------------------------------------------------
@@ -38,7 +49,7 @@ def save_extracted_json_file(file_id, extracted_payload):
     """
     Save full extracted payload (dict) for audit/debug.
     """
-    output_dir = Path("media/extracted_json")
+    output_dir = Path(settings.MEDIA_ROOT) / "extracted_json"
     output_dir.mkdir(parents=True, exist_ok=True)
 
     path = output_dir / f"{file_id}.json"
@@ -55,12 +66,257 @@ def process_file(raw_file: RawFile):
     Main orchestration:
     RawFile → ExtractedRecord → ZSODemand
     """    
+    if should_stream(raw_file):
+        stream_raw_file(raw_file)
+        return
+
+    extracted_payload = parse_raw_file(raw_file)
+    if extracted_payload is None:
+        return
+
+    save_extracted_payload(raw_file, extracted_payload)
+
+
+def should_stream(raw_file: RawFile) -> bool:
+    try:
+        return raw_file.raw_file.size >= STREAM_MIN_BYTES
+    except OSError:
+        return False
+
+
+def stream_raw_file(raw_file: RawFile) -> bool:
+    """
+    Parse + persist in one pass for large files: row batches from
+    UnifiedImporter.iter_rows() are saved as they arrive, so memory
+    stays flat however many rows the file has. raw_json keeps a
+    summary instead of every row; the audit JSON file still has them
+    all. Returns False if extraction failed (already logged).
+    """
+    rows_saved = 0
+    zso_created = 0
+    idx = 0
+
+    try:
+        if not raw_file.sha256:
+            raw_file.sha256 = sha256_file(raw_file.raw_file.path)
+            raw_file.save(update_fields=["sha256"])
+
+        # ---- CLEAN OLD DATA (re-upload safe) ----
+        ExtractedRecord.objects.filter(raw_file=raw_file).delete()
+
+        output_dir = Path(settings.MEDIA_ROOT) / "extracted_json"
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(output_dir / f"{raw_file.id}.json", "w", encoding="utf-8") as audit:
+            audit.write('{"streamed": true, "rows": [')
+
+            for batch in UnifiedImporter().iter_rows(raw_file.raw_file.path, STREAM_BATCH_ROWS):
+                for row in batch:
+                    idx += 1
+                    audit.write(("\n" if idx == 1 else ",\n") + json.dumps(make_json_safe(row)))
+
+                    saved, zso = _save_row(raw_file, idx, row)
+                    rows_saved += saved
+                    zso_created += zso
+
+            audit.write("\n]}\n")
+
+        raw_file.raw_json = {"streamed": True, "row_count": idx}
+        raw_file.save(update_fields=["raw_json"])
+
+    except ParseKilled as e:
+        ExtractionLog.objects.create(
+            raw_file=raw_file,
+            level="ERROR",
+            message=f"Parse killed ({e.reason})",
+            context={**e.context(), "rows_saved": rows_saved},
+        )
+        return False
+
+    except Exception as e:
+        ExtractionLog.objects.create(
+            raw_file=raw_file,
+            level="ERROR",
+            message="Extraction failed",
+            context={"error": str(e), "rows_saved": rows_saved},
+        )
+        return False
+
+    if not idx:
+        ExtractionLog.objects.create(
+            raw_file=raw_file,
+            level="WARNING",
+            message="No structured rows found, raw JSON saved",
+        )
+        return True
+
+    ExtractionLog.objects.create(
+        raw_file=raw_file,
+        level="SUCCESS",
+        message="Extraction completed",
+        context={
+            "rows_saved": rows_saved,
+            "zso_created": zso_created,
+            "streamed": True,
+        },
+    )
+    return True
+
+
+def parse_raw_file(raw_file: RawFile):
+    """
+    Parse step only. Returns the payload dict, or None after logging
+    the failure.
+    """
     try:
+        if not raw_file.sha256:
+            raw_file.sha256 = sha256_file(raw_file.raw_file.path)
+            raw_file.save(update_fields=["sha256"])
+
         importer = UnifiedImporter()
 
         # ✅ UnifiedImporter returns a DICT
-        extracted_payload = importer.parse(raw_file.raw_file.path) or {}
+        return importer.parse(raw_file.raw_file.path, sha256=raw_file.sha256) or {}
+
+    except ParseKilled as e:
+        ExtractionLog.objects.create(
+            raw_file=raw_file,
+            level="ERROR",
+            message=f"Parse killed ({e.reason})",
+            context=e.context(),
+        )
+        return None
+
+    except Exception as e:
+        ExtractionLog.objects.create(
+            raw_file=raw_file,
+            level="ERROR",
+            message="Extraction failed",
+            context={"error": str(e)},
+        )
+        return None
 
+
+def _save_row(raw_file: RawFile, idx: int, row):
+    """
+    Persist one extracted row: ExtractedRecord + ZSO mapping.
+    Failures are logged against the RawFile, never raised.
+    Returns (record saved, ZSO created).
+    """
+    saved = False
+    zso_created = False
+
+    if not isinstance(row, dict):
+        ExtractionLog.objects.create(
+            raw_file=raw_file,
+            level="ERROR",
+            message="Invalid row format (not a dict)",
+            context={
+                "row": idx,
+                "row_data": row,
+            },
+        )
+        return False, False
+
+    try:
+        row = make_json_safe(row)
+
+        with transaction.atomic():
+            extracted = ExtractedRecord.objects.create(
+                raw_file=raw_file,
+
+                po_number=(
+                    row.get("PO")
+                    or row.get("PO Nbr")
+                    or row.get("PURCHASE_ORDER") 
+                    or row.get("PO Number")  
+                ),
+
+                customer_part=(
+                    row.get("ERP Code")
+                    or row.get("Customer Material Number")
+                    or row.get("ITEM_NO")
+                    or row.get("Part Nbr")
+                ),
+
+                description=(
+                    row.get("Description")
+                    or row.get("DESCRIPTION")
+                    or row.get("Part Description")
+                ),
+
+                quantity=(
+                    row.get("Qty Ordered")
+                    or row.get("QUANTITY")
+                ),
+
+                open_qty=(
+                    row.get("Open Sched Qty")
+                    or row.get("Balance Due")
+                    or row.get("QUANTITY")
+                    or row.get("Yr Req/Rem Bal")
+                ),
+
+                need_date=(
+                    parse_date(str(row.get("Need Date")))
+                    if row.get("Need Date") else None
+                ),
+
+                promised_date=(
+                    parse_date(str(row.get("Promised Date")))
+                    if row.get("Promised Date") else None
+                ),
+
+                ship_date=(
+                    parse_date(str(row.get("Ship Date")))
+                    if row.get("Ship Date") else None
+                ),
+
+                full_row_json=row,
+            )
+
+            saved = True
+
+            # ---- ZSO MAPPING ----
+            try:
+                created = map_extracted_to_zso(extracted)
+                if created:
+                    zso_created = True
+            except Exception as zso_err:
+                ExtractionLog.objects.create(
+                    raw_file=raw_file,
+                    level="ERROR",
+                    message="ZSO mapping failed",
+                    context={
+                        "row": idx,
+                        "error": str(zso_err),
+                    },
+                )
+
+    except Exception as row_err:
+        ExtractionLog.objects.create(
+            raw_file=raw_file,
+            level="ERROR",
+            message="Row processing failed",
+            context={
+                "row": idx,
+                "error": str(row_err),
+                "row_data": row,
+            },
+        )
+
+    return saved, zso_created
+
+
+def save_extracted_payload(raw_file: RawFile, extracted_payload):
+    """
+    Persist an already-parsed payload:
+    raw JSON → ExtractedRecord → ZSODemand
+
+    Lets callers that already hold structured rows (e.g. email
+    bodies) skip the file write + re-parse.
+    """
+    try:
         # ---- Validate payload structure ----
         if not isinstance(extracted_payload, dict):
             raise ValueError("Extractor did not return a dict")
@@ -92,104 +348,9 @@ def process_file(raw_file: RawFile):
 
         # ---- PROCESS ROWS ----
         for idx, row in enumerate(extracted_rows, start=1):
-            if not isinstance(row, dict):
-                ExtractionLog.objects.create(
-                    raw_file=raw_file,
-                    level="ERROR",
-                    message="Invalid row format (not a dict)",
-                    context={
-                        "row": idx,
-                        "row_data": row,
-                    },
-                )
-                continue
-
-            try:
-                row = make_json_safe(row)
-
-                with transaction.atomic():
-                    extracted = ExtractedRecord.objects.create(
-                        raw_file=raw_file,
-
-                        po_number=(
-                            row.get("PO")
-                            or row.get("PO Nbr")
-                            or row.get("PURCHASE_ORDER") 
-                            or row.get("PO Number")  
-                        ),
-
-                        customer_part=(
-                            row.get("ERP Code")
-                            or row.get("Customer Material Number")
-                            or row.get("ITEM_NO")
-                            or row.get("Part Nbr")
-                        ),
-
-                        description=(
-                            row.get("Description")
-                            or row.get("DESCRIPTION")
-                            or row.get("Part Description")
-                        ),
-
-                        quantity=(
-                            row.get("Qty Ordered")
-                            or row.get("QUANTITY")
-                        ),
-
-                        open_qty=(
-                            row.get("Open Sched Qty")
-                            or row.get("Balance Due")
-                            or row.get("QUANTITY")
-                            or row.get("Yr Req/Rem Bal")
-                        ),
-
-                        need_date=(
-                            parse_date(str(row.get("Need Date")))
-                            if row.get("Need Date") else None
-                        ),
-
-                        promised_date=(
-                            parse_date(str(row.get("Promised Date")))
-                            if row.get("Promised Date") else None
-                        ),
-
-                        ship_date=(
-                            parse_date(str(row.get("Ship Date")))
-                            if row.get("Ship Date") else None
-                        ),
-
-                        full_row_json=row,
-                    )
-
-                    rows_saved += 1
-
-                    # ---- ZSO MAPPING ----
-                    try:
-                        created = map_extracted_to_zso(extracted)
-                        if created:
-                            zso_created += 1
-                    except Exception as zso_err:
-                        ExtractionLog.objects.create(
-                            raw_file=raw_file,
-                            level="ERROR",
-                            message="ZSO mapping failed",
-                            context={
-                                "row": idx,
-                                "error": str(zso_err),
-                            },
-                        )
-
-            except Exception as row_err:
-                ExtractionLog.objects.create(
-                    raw_file=raw_file,
-                    level="ERROR",
-                    message="Row processing failed",
-                    context={
-                        "row": idx,
-                        "error": str(row_err),
-                        "row_data": row,
-                    },
-                )
+            saved, zso = _save_row(raw_file, idx, row)
+            rows_saved += saved
+            zso_created += zso
 
         # ---- FINAL SUCCESS LOG ----
         ExtractionLog.objects.create(
@@ -0,0 +1,181 @@
+"""
+Priority and cost-aware ordering of media/raw_files work.
+
+Each file gets an estimated cost (type weight × size, plus pages for
+PDFs) and a priority (sender/customer SLA boost, age). Cheap files go
+to a fast lane so a 2 KB body table never waits behind a 200-page OCR
+job; within a lane, lower score runs first.
+"""
+
+import os
+import re
+import time
+from datetime import timedelta
+from email.utils import parseaddr
+from pathlib import Path
+
+from django.utils import timezone
+
+from importer.models import IngestedMessage
+from config.logger import logger
+
+
+def _weights_env(name, default):
+    """
+    "@acme.com=4,.pdf=8" → {"@acme.com": 4.0, ".pdf": 8.0}
+    """
+    out = {}
+    for item in os.getenv(name, default).split(","):
+        key, _, value = item.partition("=")
+        if key.strip() and value.strip():
+            out[key.strip().lower()] = float(value)
+    return out
+
+
+# Relative parse cost per MB by extension
+TYPE_COST = _weights_env(
+    "RAW_TYPE_COST",
+    ".csv=1,.txt=1,.xlsx=2,.docx=2,.xls=3,.pdf=6",
+)
+
+# Extra cost per PDF page (OCR dominates large PDFs)
+PDF_PAGE_COST = float(os.getenv("RAW_PDF_PAGE_COST", 1.0))
+
+# SLA boost by sender address or @domain; higher runs sooner
+SENDER_PRIORITY = _weights_env("RAW_SLA_SENDERS", "")
+
+# Score reduction per minute a file has waited (prevents starvation)
+AGE_WEIGHT = float(os.getenv("RAW_AGE_WEIGHT", 0.5))
+
+# Files at or below this cost use the fast lane
+FAST_LANE_MAX_COST = float(os.getenv("RAW_FAST_LANE_MAX_COST", 5))
+
+# Pool workers reserved for the fast lane
+FAST_LANE_WORKERS = int(os.getenv("RAW_FAST_LANE_WORKERS", 1))
+
+# How far back attachment → sender lookups go
+SENDER_LOOKBACK_DAYS = int(os.getenv("RAW_SENDER_LOOKBACK_DAYS", 14))
+
+# Email attachments are stored as <stem>_<sha256[:12]><ext>
+_ADDRESSED_RE = re.compile(r"_([0-9a-f]{12})\.[^.]+$")
+
+# str(path) → (size, mtime, pages); files that left the folder are pruned
+_page_cache = {}
+
+
+def _pdf_pages(path: Path, stat) -> int:
+    """
+    Page count from the document catalog's /Pages /Count. Only the xref
+    and the page-tree root are read; no page is parsed, so planning a
+    folder of large PDFs stays cheap.
+    """
+    key = str(path)
+    cached = _page_cache.get(key)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime):
+        return cached[2]
+
+    try:
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdftypes import resolve1
+
+        with open(path, "rb") as f:
+            document = PDFDocument(PDFParser(f))
+            pages = int(resolve1(resolve1(document.catalog["Pages"])["Count"]))
+    except Exception as e:
+        # Cost falls back to type weight × size
+        logger.warning(f"Could not count pages of {path.name}: {e}")
+        pages = 0
+
+    _page_cache[key] = (stat.st_size, stat.st_mtime, pages)
+    return pages
+
+
+def _prune_page_cache():
+    # Planned files get archived; a long-running watcher must not keep them
+    for key in [key for key in _page_cache if not os.path.exists(key)]:
+        del _page_cache[key]
+
+
+def _senders_by_hash() -> dict:
+    """
+    sha256[:12] → sender, for attachments of recently ingested emails.
+    """
+    since = timezone.now() - timedelta(days=SENDER_LOOKBACK_DAYS)
+    senders = {}
+    for sender, hashes in (
+        IngestedMessage.objects
+        .filter(ingested_at__gte=since)
+        .exclude(sender="")
+        .values_list("sender", "attachment_hashes")
+    ):
+        for sha in hashes or []:
+            senders[sha[:12]] = sender
+    return senders
+
+
+def _sender_priority(sender) -> float:
+    if not sender or not SENDER_PRIORITY:
+        return 0.0
+    address = parseaddr(sender)[1].lower()
+    domain = "@" + address.rpartition("@")[2]
+    return max(SENDER_PRIORITY.get(address, 0.0), SENDER_PRIORITY.get(domain, 0.0))
+
+
+def estimate_cost(path: Path, stat=None) -> float:
+    stat = stat or path.stat()
+    ext = path.suffix.lower()
+    cost = TYPE_COST.get(ext, 1.0) * (1 + stat.st_size / (1024 * 1024))
+    if ext == ".pdf":
+        cost += PDF_PAGE_COST * _pdf_pages(path, stat)
+    return cost
+
+
+def plan(paths) -> list:
+    """
+    Returns [{"path", "lane", "cost", "score"}] ordered fast lane first,
+    then by score (lowest first) within each lane.
+    """
+    paths = list(paths)
+    if not paths:
+        return []
+
+    _prune_page_cache()
+    senders = _senders_by_hash() if SENDER_PRIORITY else {}
+    now = time.time()
+    planned = []
+
+    for path in paths:
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+
+        cost = estimate_cost(path, stat)
+
+        match = _ADDRESSED_RE.search(path.name)
+        priority = _sender_priority(senders.get(match.group(1))) if match else 0.0
+        age_minutes = max(0.0, now - stat.st_mtime) / 60
+
+        planned.append({
+            "path": path,
+            "lane": "fast" if cost <= FAST_LANE_MAX_COST else "slow",
+            "cost": cost,
+            "score": cost / (1 + priority) - AGE_WEIGHT * age_minutes,
+        })
+
+    planned.sort(key=lambda item: (item["lane"] != "fast", item["score"]))
+    return planned
+
+
+def lane_workers(workers: int, planned) -> dict:
+    """
+    Split a worker budget between the lanes that have work.
+    """
+    lanes = {item["lane"] for item in planned}
+    if workers < 2 or len(lanes) < 2:
+        return {lane: max(1, workers) for lane in lanes}
+
+    fast = min(max(1, FAST_LANE_WORKERS), workers - 1)
+    return {"fast": fast, "slow": workers - fast}